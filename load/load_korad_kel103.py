@@ -9,6 +9,8 @@ import io
 import os
 import contextlib
 
+from ..state_cache_mixin import StateCacheMixin
+
 
 with io.open(os.path.join(os.path.dirname(__file__), "load_korad_kel103.rst"), "r") as fi:
 	__doc__ = fi.read()
@@ -17,8 +19,13 @@ with io.open(os.path.join(os.path.dirname(__file__), "load_korad_kel103.rst"), "
 logger = logging.getLogger(__name__)
 
 
-class Load:
-	def __init__(self, scpi):
+class Load(StateCacheMixin):
+	def __init__(self, scpi, cache=False):
+		"""
+		:param cache: whether to cache function, setpoints and input
+		 state (see StateCacheMixin)
+		"""
+		StateCacheMixin.__init__(self, cache)
 		self.scpi = scpi
 
 	def __enter__(self):
@@ -33,13 +40,22 @@ class Load:
 		"""
 		Configure setpoint (depending on present mode)
 		"""
-		self.scpi.write(f":{self._func} {value:.3f}{self._unit}")
+		func, unit = self._func, self._unit
+		self._state_set(func, float(f"{value:.3f}"),
+		 lambda: self.scpi.write(f":{func} {value:.3f}{unit}"))
+		if self._state is not None and self._state.get("FUNC") != self._funcs[func]:
+			# setting may switch function, unless it's the present one
+			self._state_forget("FUNC")
 
 	def setpoint_get(self):
 		"""
 		Obtain setpoint (depending on present mode)
 		"""
-		return float(self.scpi.ask(f":{self._func}?")[:-len(self._unit)])
+		func, unit = self._func, self._unit
+		return self._state_get(func,
+		 lambda: float(self.scpi.ask(f":{func}?")[:-len(unit)]))
+
+	_funcs = dict(CURR="CC", VOLT="CV", RES="CR", POW="CW")
 
 	def create_measure(kw, unit):
 		def get(self):
@@ -53,17 +69,63 @@ class Load:
 	measure_u = create_measure("VOLT", "V")
 	measure_p = create_measure("POW", "W")
 
+	def measure_all(self):
+		"""
+		Measure voltage, current and power in one round trip
+		"""
+		res = self.scpi.ask_many((":MEAS:VOLT?", ":MEAS:CURR?", ":MEAS:POW?"))
+		return tuple(float(x[:-1]) for x in res)
+
+	def snapshot(self):
+		"""
+		Obtain setpoint (depending on present mode), input state and
+		measurements in one round trip
+
+		:return: setpoint, input state, voltage, current, power
+		"""
+		sp, inp, u, i, p = self.scpi.ask_many((
+		 f":{self._func}?",
+		 ":INP?",
+		 ":MEAS:VOLT?",
+		 ":MEAS:CURR?",
+		 ":MEAS:POW?",
+		))
+		return (
+		 float(sp[:-len(self._unit)]),
+		 {"OFF": False, "ON": True}[inp],
+		 float(u[:-1]),
+		 float(i[:-1]),
+		 float(p[:-1]),
+		)
+
+	def _get_mode(self):
+		return self._state_get("FUNC", lambda: self.scpi.ask(":FUNC?"))
+
 	def _set_mode(self, func):
-		self.scpi.write(f":FUNC {func}")
-		func_rb = self.scpi.ask(":FUNC?")
-		if func_rb != func:
-			raise RuntimeError()
+		state = self._state
+		if state is not None and state.get("FUNC") == func:
+			return
+
+		def command():
+			self.scpi.write(f":FUNC {func}")
+			if state is not None and ("FUNC", func) in state:
+				# change to this function already checked, trust the
+				# instrument
+				return
+			func_rb = self.scpi.ask(":FUNC?")
+			if func_rb != func:
+				raise RuntimeError(f"Function {func} refused, got {func_rb}")
+
+		self._state_set("FUNC", func, command)
+		if state is not None:
+			state["FUNC", func] = True
 
 	@contextlib.contextmanager
 	def backup_and_restore_func(self):
-		func_old = self.scpi.ask(":FUNC?")
+		func_old = self._get_mode()
 		yield self
 		if func_old == "CONTINUOUS CV":
+			self._state_forget("FUNC")
 			self.scpi.ask(":DYN?")
 		else:
 			self._set_mode(func_old)
@@ -87,14 +149,16 @@ class Load:
 		self.scpi.write(f"*SAV {index}")
 
 	def recall(self, index: int):
+		self.resync()
 		self.scpi.write(f"*RCL {index}")
 
 	def activate(self, doit):
-		self.scpi.write(f":INP {1 if doit else 0}")
+		self._state_set("INP", bool(doit),
+		 lambda: self.scpi.write(f":INP {1 if doit else 0}"))
 
 	def activated(self):
-		v = self.scpi.ask(":INP?")
-		return {"OFF": False, "ON": True}[v]
+		return self._state_get("INP",
+		 lambda: {"OFF": False, "ON": True}[self.scpi.ask(":INP?")])
 
 	def trigger(self):
 		self.scpi.write("*TRG")
@@ -108,7 +172,83 @@ class Load:
 		:param dutycycle: ratio of second setpoint duration over total duration
 		"""
 		with self.backup_and_restore_func():
+			self._state_forget("FUNC")
 			self.scpi.write(f":DYN 1,{setpoint_a}V,{setpoint_b}V,{frequency}HZ,{dutycycle*100}%")
 			self.scpi.ask(":DYN?")
 			yield self
-			self.scpi.write(":INP 0")
+			self._state_set("INP", False, lambda: self.scpi.write(":INP 0"))
+
+
+class AsyncLoad:
+	"""
+	Load, for asyncio transports
+	"""
+	def __init__(self, scpi):
+		self.scpi = scpi
+
+	async def __aenter__(self):
+		idn = await self.scpi.ask("*IDN?")
+		logger.info("IDN: %s", idn)
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, exc_traceback):
+		pass
+
+	async def setpoint_set(self, value):
+		await self.scpi.write(f":{self._func} {value:.3f}{self._unit}")
+
+	async def setpoint_get(self):
+		return float((await self.scpi.ask(f":{self._func}?"))[:-len(self._unit)])
+
+	def create_measure(kw, unit):
+		async def get(self):
+			return float((await self.scpi.ask(f":MEAS:{kw}?"))[:-len(unit)])
+		return get
+
+	measure_i = create_measure("CURR", "A")
+	measure_u = create_measure("VOLT", "V")
+	measure_p = create_measure("POW", "W")
+
+	async def measure_all(self):
+		res = await self.scpi.ask_many((":MEAS:VOLT?", ":MEAS:CURR?", ":MEAS:POW?"))
+		return tuple(float(x[:-1]) for x in res)
+
+	async def _set_mode(self, func):
+		await self.scpi.write(f":FUNC {func}")
+		func_rb = await self.scpi.ask(":FUNC?")
+		if func_rb != func:
+			raise RuntimeError()
+
+	@contextlib.asynccontextmanager
+	async def backup_and_restore_func(self):
+		func_old = await self.scpi.ask(":FUNC?")
+		yield self
+		if func_old == "CONTINUOUS CV":
+			await self.scpi.ask(":DYN?")
+		else:
+			await self._set_mode(func_old)
+
+	def create_mode(mode, kw, unit):
+		@contextlib.asynccontextmanager
+		async def in_mode(self):
+			async with self.backup_and_restore_func():
+				await self._set_mode(mode)
+				self._func = kw
+				self._unit = unit
+				yield self
+		return in_mode
+
+	in_cc = create_mode("CC", "CURR", "A")
+	in_cv = create_mode("CV", "VOLT", "V")
+	in_cr = create_mode("CR", "RES", "OHM")
+	in_cw = create_mode("CW", "POW", "W")
+
+	async def activate(self, doit):
+		await self.scpi.write(f":INP {1 if doit else 0}")
+
+	async def activated(self):
+		v = await self.scpi.ask(":INP?")
+		return {"OFF": False, "ON": True}[v]
+
+	async def trigger(self):
+		await self.scpi.write("*TRG")
@@ -135,3 +135,51 @@ class Multimeter(NestedContextMixin):
 		res = float(a)
 		return res
 
+
+class AsyncMultimeter:
+	"""
+	Multimeter, for asyncio transports
+	"""
+	def __init__(self, scpi):
+		self.scpi = scpi
+
+	async def __aenter__(self):
+		idn = await self.scpi.ask("*IDN?")
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, exc_tb):
+		pass
+
+	async def init_remote(self):
+		logger.info("Enter remote control")
+		await self.scpi.write("SYST:REM")
+
+	async def init_local(self):
+		logger.info("Enter local control")
+		await self.scpi.write("SYST:LOC")
+
+	async def get_both(self):
+		l = await self.scpi.ask("INIT; FETCH1?; FETCH2?")
+		m = re.match(r"(?P<i>\S+);(?P<v>\S+)", l)
+		assert m is not None
+		return float(m.group("i")), float(m.group("v"))
+
+	async def get_one(self):
+		l = await self.scpi.ask("INIT; FETCH1?")
+		m = re.match(r"(?P<i>\S+)", l)
+		assert m is not None
+		return float(m.group("i"))
+
+	async def fetch(self, function=1):
+		l = await self.scpi.ask(f"FETCH{function}?")
+		return [float(x) for x in l.split(",")]
+
+	async def get_volts(self, rng=100):
+		a = await self.scpi.ask("MEAS:VOLT:DC? %d" % rng)
+		a = a.strip().replace("+", "").replace("'", "")
+		return float(a)
+
+	async def get_amps(self):
+		a = await self.scpi.ask("MEAS:CURR:DC?")
+		a = a.strip().replace("+", "").replace("'", "")
+		return float(a)
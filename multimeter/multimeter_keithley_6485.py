@@ -34,6 +34,25 @@ class Multimeter():
 		return a
 
 
+class AsyncMultimeter():
+	"""
+	Multimeter, for asyncio transports
+	"""
+	def __init__(self, scpi):
+		self.s = scpi
+
+	async def __aenter__(self):
+		await self.s.ask("*IDN?")
+		return self
+
+	async def __aexit__(self, ext_type, exc_value, exc_traceback):
+		pass
+
+	async def measure_immediate(self):
+		a, b, c = (await self.s.ask("MEAS?")).split(",")
+		return a
+
+
 def main(argv=None):
 	import argparse
 
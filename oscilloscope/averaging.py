@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Averaging and equivalent-time sampling of repetitive signals
+# SPDX-License-Identifier: MIT
+
+"""
+Accumulators for repetitive, triggered signals, updated in place so
+that frames needn't be kept:
+
+- Average: running average of frames, for noise reduction;
+- EquivalentTime: frames are placed on a time grid finer than the
+  sample period, according to the phase of the trigger, then averaged
+  per grid bin, for higher effective time resolution.
+
+The CGR-101 trigger position only tells which sample the trigger
+occurred at, and it's already compensated by read_data_buffer();
+the sub-sample phase of each frame is estimated from the interpolated
+crossing of the trigger level on the trigger channel.
+
+"""
+
+import logging
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class Average:
+	def __init__(self, n, shape=(2, 1024)):
+		"""
+		:param n: amount of frames averaged; past that, the average
+		 becomes exponential with a time constant of n frames
+		:param shape: frame shape
+		"""
+		self.n = n
+		self.data = np.zeros(shape, dtype=np.float32)
+		self._tmp = np.empty(shape, dtype=np.float32)
+		self.count = 0
+
+	def reset(self):
+		self.data[...] = 0
+		self.count = 0
+
+	def add(self, x):
+		"""
+		:param x: frame
+		"""
+		self.count += 1
+		tmp = self._tmp
+		np.subtract(x, self.data, out=tmp)
+		tmp *= 1 / min(self.count, self.n)
+		self.data += tmp
+
+	@property
+	def done(self):
+		return self.count >= self.n
+
+
+class EquivalentTime:
+	def __init__(self, factor=8, level=0.0, channel=0, samples=1024, channels=2):
+		"""
+		:param factor: amount of grid bins per sample period
+		:param level: trigger level (V)
+		:param channel: index of trigger channel
+		"""
+		self.factor = factor
+		self.level = level
+		self.channel = channel
+		self.samples = samples
+		self._sums = np.zeros((channels, samples * factor))
+		self._counts = np.zeros(samples * factor, dtype=np.int64)
+		self._idx = np.arange(samples)
+		self.reference = None
+		self.count = 0
+
+	def reset(self):
+		self._sums[...] = 0
+		self._counts[...] = 0
+		self.reference = None
+		self.count = 0
+
+	def phase(self, x):
+		"""
+		:param x: trigger channel samples
+		:return: fractional sample index of the rising crossing of the
+		 trigger level closest to the reference, None if there's none
+		"""
+		above = x >= self.level
+		rising = np.flatnonzero(~above[:-1] & above[1:])
+		if len(rising) == 0:
+			return None
+		if self.reference is None:
+			i = rising[0]
+		else:
+			i = rising[np.argmin(np.abs(rising - self.reference))]
+		x0, x1 = x[i], x[i+1]
+		return i + (self.level - x0) / (x1 - x0)
+
+	def add(self, x):
+		"""
+		:param x: frame, of channels × samples
+		:return: whether the frame was used
+		"""
+		t = self.phase(x[self.channel])
+		if t is None:
+			return False
+		if self.reference is None:
+			self.reference = int(round(t))
+		# grid bin of each sample, with the crossing at the reference
+		k = np.floor((self._idx - t + self.reference) * self.factor).astype(np.intp)
+		valid = (k >= 0) & (k < len(self._counts))
+		k = k[valid]
+		n = len(self._counts)
+		self._counts += np.bincount(k, minlength=n)
+		for sums, y in zip(self._sums, x):
+			sums += np.bincount(k, weights=y[valid], minlength=n)
+		self.count += 1
+		return True
+
+	@property
+	def time(self):
+		"""
+		:return: grid times, in sample periods, relative to the trigger
+		 level crossing
+		"""
+		return (np.arange(len(self._counts)) + 0.5) / self.factor - self.reference
+
+	@property
+	def data(self):
+		"""
+		:return: average per grid bin, NaN where no sample fell
+		"""
+		with np.errstate(divide="ignore", invalid="ignore"):
+			return self._sums / self._counts
+
+
+def acquire_average(scope, n, internal_trigger=False):
+	"""
+	Average n triggered frames
+
+	:return: (2, 1024) array
+	"""
+	avg = Average(n)
+	frame = np.empty((2, 1024), dtype=np.float32)
+	while not avg.done:
+		if internal_trigger:
+			scope.capture()
+		else:
+			scope.trigger()
+		scope.read_data_buffer(out=frame)
+		avg.add(frame)
+	return avg.data
+
+
+def acquire_equivalent_time(scope, n, factor=8, level=0.0, channel=0, internal_trigger=False):
+	"""
+	Accumulate n triggered frames in equivalent time
+
+	:return: EquivalentTime accumulator
+	"""
+	et = EquivalentTime(factor=factor, level=level, channel=channel)
+	frame = np.empty((2, 1024), dtype=np.float32)
+	for idx in range(n):
+		if internal_trigger:
+			scope.capture()
+		else:
+			scope.trigger()
+		scope.read_data_buffer(out=frame)
+		if not et.add(frame):
+			logger.debug("No trigger crossing in frame %d", idx)
+	return et
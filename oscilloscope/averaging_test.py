@@ -0,0 +1,37 @@
+import logging
+
+import numpy as np
+
+from .averaging import Average, EquivalentTime
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_average():
+	rng = np.random.default_rng(0)
+	signal = np.sin(2 * np.pi * np.arange(1024) / 100)
+	avg = Average(64)
+	while not avg.done:
+		avg.add(signal + rng.normal(scale=0.1, size=(2, 1024)))
+	assert avg.count == 64
+	assert np.std(avg.data - signal) < 0.1 / 4
+
+
+def test_equivalent_time():
+	rng = np.random.default_rng(0)
+	period = 10.3 # in samples
+	factor = 8
+	et = EquivalentTime(factor=factor)
+	for idx in range(200):
+		# trigger at a random sub-sample phase
+		t = np.arange(1024) + rng.uniform()
+		x = np.sin(2 * np.pi * t / period)
+		assert et.add(np.stack((x, -x)))
+
+	data = et.data
+	valid = ~np.isnan(data[0])
+	assert valid.mean() > 0.9
+	expected = np.sin(2 * np.pi * et.time / period)
+	np.testing.assert_allclose(data[0][valid], expected[valid], atol=0.6 * 2 * np.pi / period / factor)
+	np.testing.assert_allclose(data[1][valid], -expected[valid], atol=0.6 * 2 * np.pi / period / factor)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Frequency response sweep, using the CGR-101 generator and scope
+# SPDX-License-Identifier: MIT
+
+"""
+The generator output drives the device under test and input A, its
+output goes to input B; for each frequency, the gain and phase of B
+relative to A are estimated from one frame.
+
+The sweep is pipelined: while a frame is being analyzed in a worker
+thread, the next frequency is configured and acquired.
+
+For each frequency, the frame period is chosen to span at most `cycles`
+periods of the signal, within the scope's sample rates, and the
+amplitude and phase on each channel are estimated by correlation with
+a windowed complex exponential at the generator frequency.
+
+"""
+
+import time
+import logging
+import concurrent.futures
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+response_dtype = np.dtype([
+ ("frequency", "f8"),
+ ("gain", "f8"),
+ ("phase", "f8"),
+ ("amplitude_a", "f8"),
+ ("amplitude_b", "f8"),
+ ("sample_rate", "f8"),
+])
+
+
+def frame_period(frequency, cycles=8):
+	"""
+	:return: frame period (s) to request for a frequency
+	"""
+	# the fastest sample rate is selected when asking for 10 Msps
+	return max(cycles / frequency, 1024 / 10e6)
+
+
+def estimate(frame, frequency, sample_rate, out):
+	"""
+	Estimate gain and phase of B relative to A
+
+	:param frame: (2, 1024) array
+	:param out: response_dtype record to fill
+	"""
+	n = frame.shape[-1]
+	w = np.hanning(n)
+	t = np.arange(n) / sample_rate
+	ref = w * np.exp(-2j * np.pi * frequency * t)
+	a, b = 2 * (frame @ ref) / w.sum()
+	out["frequency"] = frequency
+	out["sample_rate"] = sample_rate
+	out["amplitude_a"] = abs(a)
+	out["amplitude_b"] = abs(b)
+	out["gain"] = abs(b) / abs(a)
+	out["phase"] = np.angle(b / a)
+
+
+def sweep(scope, frequencies, cycles=8, settle=0.0, internal_trigger=True):
+	"""
+	Measure frequency response
+
+	:param scope: scope_cgr101.Scope
+	:param frequencies: frequencies (Hz)
+	:param cycles: max. amount of signal periods per frame; as the
+	 sample rate is rounded up to the next one available, a frame
+	 holds between about cycles/2 and cycles periods
+	:param settle: time to wait after changing frequency (s)
+	:param internal_trigger: use capture() rather than trigger();
+	 the scope trigger source is restored afterwards
+	:return: array of response_dtype, phase in radians
+	"""
+	frequencies = np.asarray(frequencies, dtype=float)
+	res = np.zeros(len(frequencies), dtype=response_dtype)
+	# one buffer being analyzed, one being acquired
+	buffers = np.empty((2, 2, 1024), dtype=np.float32)
+	pending = [None, None]
+
+	external_trigger = scope.external_trigger
+	if internal_trigger and external_trigger:
+		scope._set_control_register(external_trigger=0)
+
+	try:
+		t0 = time.monotonic()
+		with concurrent.futures.ThreadPoolExecutor(1) as executor:
+			for idx, frequency in enumerate(frequencies):
+				scope.waveform_configure(freq=frequency)
+				sample_rate = 1024 / scope.set_frame_period(frame_period(frequency, cycles))
+				if settle:
+					time.sleep(settle)
+
+				slot = idx % 2
+				if pending[slot] is not None:
+					pending[slot].result()
+
+				if internal_trigger:
+					scope.capture()
+				else:
+					scope.trigger()
+				scope.read_data_buffer(out=buffers[slot])
+				pending[slot] = executor.submit(estimate,
+				 buffers[slot], frequency, sample_rate, res[idx:idx+1])
+
+			for future in pending:
+				if future is not None:
+					future.result()
+	finally:
+		if scope.external_trigger != external_trigger:
+			scope._set_control_register(external_trigger=external_trigger)
+
+	t1 = time.monotonic()
+	logger.info("Swept %d frequencies in %f s", len(frequencies), t1-t0)
+	return res
@@ -0,0 +1,31 @@
+import time
+import logging
+
+import serial
+import numpy as np
+
+from .scope_cgr101 import Scope
+from .bode import sweep
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_sweep():
+	from ..simulator.sim_cgr101 import CGR101
+	cutoff = 10e3
+	with CGR101(cutoff=cutoff) as sim:
+		with serial.Serial(port=sim.path, baudrate=230400) as ser:
+			with Scope(ser) as scope:
+				f = np.geomspace(100, 200e3, 100)
+				t0 = time.monotonic()
+				assert scope.external_trigger
+				res = sweep(scope, f)
+				t1 = time.monotonic()
+				assert scope.external_trigger
+				logger.info("%d points in %f s, %d frames", len(f), t1-t0, sim.frames)
+
+	ratio = f / cutoff
+	np.testing.assert_allclose(res["frequency"], f)
+	np.testing.assert_allclose(res["gain"], 1 / np.sqrt(1 + ratio**2), rtol=0.05)
+	np.testing.assert_allclose(res["phase"], -np.arctan(ratio), atol=0.05)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Streaming scope frame recorder, to memory-mapped files
+# SPDX-License-Identifier: MIT
+
+"""
+Frames are appended to a file made of a small header followed by
+fixed-size records (see frame_dtype).
+
+The file is preallocated, and grown geometrically when full, so that
+appending a frame is a copy into the mapping; the frame count in the
+header is updated on each append, so a file being written can be read,
+and it's truncated to the recorded frames when closed.
+
+"""
+
+import time
+import mmap
+import struct
+import logging
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+MAGIC = b"XMFRAMES"
+VERSION = 1
+# magic, version, record size, frame count
+HEADER_FMT = "<8sIIQ"
+HEADER_SIZE = 64
+
+frame_dtype = np.dtype([
+ ("a", "<f4", (1024,)),
+ ("b", "<f4", (1024,)),
+ ("pos", "<i4"),
+ ("gains", "<f4", (2,)),
+ ("sample_rate", "<f8"),
+ ("timestamp", "<f8"),
+ ("index", "<u8"),
+])
+
+
+class Recorder:
+	def __init__(self, path, capacity=1024):
+		"""
+		:param path: file to write
+		:param capacity: amount of frames initially allocated
+		"""
+		self.path = path
+		self._capacity = capacity
+		self._mm = None
+		self._frames = None
+		self.count = 0
+
+	def __enter__(self):
+		self._f = open(self.path, "w+b")
+		self.count = 0
+		self._resize(self._capacity)
+		return self
+
+	def __exit__(self, exc_type, exc_value, exc_tb):
+		self._unmap()
+		self._f.truncate(HEADER_SIZE + self.count * frame_dtype.itemsize)
+		self._f.close()
+
+	def _unmap(self):
+		if self._mm is not None:
+			self._frames = None
+			self._mm.flush()
+			self._mm.close()
+			self._mm = None
+
+	def _resize(self, capacity):
+		self._unmap()
+		self._f.truncate(HEADER_SIZE + capacity * frame_dtype.itemsize)
+		self._mm = mmap.mmap(self._f.fileno(), 0)
+		self._frames = np.frombuffer(self._mm, dtype=frame_dtype,
+		 count=capacity, offset=HEADER_SIZE)
+		self._capacity = capacity
+		self._write_header()
+
+	def _write_header(self):
+		struct.pack_into(HEADER_FMT, self._mm, 0,
+		 MAGIC, VERSION, frame_dtype.itemsize, self.count)
+
+	def append(self, a, b, pos, sample_rate, gains, timestamp=None, index=None):
+		"""
+		Append a frame
+
+		:param a: channel A samples
+		:param b: channel B samples
+		:param pos: trigger position
+		:param sample_rate: sample rate (Hz)
+		:param gains: volts per sample code of channels A and B
+		:param timestamp: host wall-clock time (time.time()), by
+		 default now
+		:param index: acquisition frame index, by default the
+		 recording row
+		"""
+		n = self.count
+		if n == self._capacity:
+			self._resize(2 * self._capacity)
+		frames = self._frames
+		frames["a"][n] = a
+		frames["b"][n] = b
+		frames["pos"][n] = pos
+		frames["gains"][n] = gains
+		frames["sample_rate"][n] = sample_rate
+		frames["timestamp"][n] = time.time() if timestamp is None else timestamp
+		frames["index"][n] = n if index is None else index
+		self.count = n + 1
+		self._write_header()
+
+	def record(self, scope, frame):
+		"""
+		Append a frame from scope_cgr101.Acquisition
+
+		:param scope: the scope, providing settings
+		:param frame: scope_cgr101.Frame
+		"""
+		# frame timestamps are monotonic, store wall-clock time
+		timestamp = frame.timestamp + (time.time() - time.monotonic())
+		self.append(frame.a, frame.b, frame.pos,
+		 scope.get_sample_rate(), scope.adstepsize, timestamp, frame.index)
+
+
+def load(path):
+	"""
+	Map a recording
+
+	:return: read-only structured array of frame_dtype
+	"""
+	with open(path, "rb") as f:
+		header = f.read(HEADER_SIZE)
+	magic, version, itemsize, count = struct.unpack_from(HEADER_FMT, header)
+	if magic != MAGIC:
+		raise ValueError(f"{path} is not a frame recording")
+	if version != VERSION or itemsize != frame_dtype.itemsize:
+		raise ValueError(f"Unsupported frame recording version {version}")
+	if count == 0:
+		return np.empty(0, dtype=frame_dtype)
+	return np.memmap(path, dtype=frame_dtype, mode="r",
+	 offset=HEADER_SIZE, shape=(count,))
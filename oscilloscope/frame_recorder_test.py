@@ -0,0 +1,57 @@
+import os
+import logging
+
+import numpy as np
+
+from .frame_recorder import Recorder, load, HEADER_SIZE, frame_dtype
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_recorder(tmp_path):
+	path = tmp_path / "frames.bin"
+	n = 100
+	rng = np.random.default_rng(0)
+	data = rng.normal(size=(n, 2, 1024)).astype(np.float32)
+
+	with Recorder(path, capacity=16) as rec:
+		for idx in range(n):
+			rec.append(data[idx,0], data[idx,1], idx % 1024, 20e6, (0.00592, 0.0521),
+			 timestamp=idx)
+			if idx == 20:
+				assert len(load(path)) == 21
+
+	assert os.path.getsize(path) == HEADER_SIZE + n * frame_dtype.itemsize
+
+	frames = load(path)
+	assert len(frames) == n
+	np.testing.assert_array_equal(frames["a"], data[:,0])
+	np.testing.assert_array_equal(frames["b"], data[:,1])
+	np.testing.assert_array_equal(frames["pos"], np.arange(n))
+	np.testing.assert_array_equal(frames["index"], np.arange(n))
+	np.testing.assert_array_equal(frames["timestamp"], np.arange(n))
+	assert np.all(frames["sample_rate"] == 20e6)
+
+
+def test_record(tmp_path):
+	import time
+	from .scope_cgr101 import Frame
+
+	class scope:
+		adstepsize = (0.00592, 0.0521)
+		def get_sample_rate():
+			return 20e6
+
+	path = tmp_path / "frames.bin"
+	a = np.zeros(1024, dtype=np.float32)
+	t0 = time.time()
+	with Recorder(path) as rec:
+		# acquisition dropped frame 1
+		for index in (0, 2, 3):
+			rec.record(scope, Frame(a, a, 0, time.monotonic(), index))
+	t1 = time.time()
+
+	frames = load(path)
+	np.testing.assert_array_equal(frames["index"], [0, 2, 3])
+	assert np.all((frames["timestamp"] >= t0 - 0.01) & (frames["timestamp"] <= t1 + 0.01))
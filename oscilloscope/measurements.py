@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Batch waveform measurements
+# SPDX-License-Identifier: MIT
+
+"""
+Waveform measurements, computed over stacks of frames (frames × samples)
+with one vectorized pass per quantity rather than one Python loop
+iteration per frame.
+
+Rising edges are detected with hysteresis: the waveform has to go
+below the lower threshold (mid level - 10 % of peak-to-peak) then above
+the upper one (mid level + 10 %), so that noise around the mid level
+(halfway between min. and max.) doesn't make extra edges.
+The edge time is that of the last mid level crossing within this
+window, linearly interpolated between the samples surrounding it.
+Measurements which can't be made (eg. frequency when there's less than
+2 rising edges) are NaN.
+
+"""
+
+import logging
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+measurement_dtype = np.dtype([
+ ("mean", "f8"),
+ ("rms", "f8"),
+ ("p2p", "f8"),
+ ("frequency", "f8"),
+ ("duty", "f8"),
+ ("rise_time", "f8"),
+])
+
+
+def _crossings(x, level):
+	"""
+	:return: mask of upward crossings of level, between sample i and i+1
+	"""
+	above = x >= level[:,None]
+	return ~above[:,:-1] & above[:,1:], above
+
+
+def _fill_forward(mask):
+	"""
+	:return: index of the last True at or before each position, -1 if
+	 there's none
+	"""
+	idx = np.where(mask, np.arange(mask.shape[1])[None,:], -1)
+	return np.maximum.accumulate(idx, axis=1)
+
+
+def _fill_backward(mask):
+	"""
+	:return: index of the first True at or after each position, the
+	 row length if there's none
+	"""
+	n = mask.shape[1]
+	idx = np.where(mask, np.arange(n)[None,:], n)
+	return np.minimum.accumulate(idx[:,::-1], axis=1)[:,::-1]
+
+
+def _take(x, idx):
+	return np.take_along_axis(x, np.clip(idx, 0, x.shape[1] - 1), axis=1)
+
+
+def _rising_edges(x, lower, upper):
+	"""
+	:return: mask of rising edges between sample i and i+1, where x
+	 gets above upper after having been below lower
+	"""
+	is_high = x >= upper[:,None]
+	known = is_high | (x <= lower[:,None])
+	last = _fill_forward(known)
+	high = _take(is_high, last)
+	low = ~high & (last >= 0)
+	return low[:,:-1] & high[:,1:]
+
+
+def _first(mask):
+	"""
+	:return: index of first True per row, and whether there's one
+	"""
+	idx = np.argmax(mask, axis=1)
+	return idx, mask[np.arange(len(mask)), idx]
+
+
+def _last(mask):
+	idx = mask.shape[1] - 1 - np.argmax(mask[:,::-1], axis=1)
+	return idx, mask[np.arange(len(mask)), idx]
+
+
+def _interpolate(x, idx, level):
+	"""
+	:return: fractional sample index where x crosses level between
+	 samples idx and idx+1
+	"""
+	rows = np.arange(len(x))
+	x0 = x[rows, idx]
+	x1 = x[rows, idx+1]
+	with np.errstate(divide="ignore", invalid="ignore"):
+		return idx + (level - x0) / (x1 - x0)
+
+
+def measure(x, sample_rate, out=None):
+	"""
+	Measure frames
+
+	:param x: array of frames × samples
+	:param sample_rate: sample rate (Hz)
+	:param out: optional output array of measurement_dtype
+	:return: array of measurement_dtype, one per frame
+	"""
+	x = np.atleast_2d(x)
+	n_frames, n_samples = x.shape
+	if out is None:
+		out = np.empty(n_frames, dtype=measurement_dtype)
+
+	lo = x.min(axis=1)
+	hi = x.max(axis=1)
+	p2p = hi - lo
+	out["mean"] = x.mean(axis=1)
+	out["rms"] = np.sqrt(np.einsum("ij,ij->i", x, x) / n_samples)
+	out["p2p"] = p2p
+
+	mid = lo + 0.5 * p2p
+	rising = _rising_edges(x, mid - 0.1 * p2p, mid + 0.1 * p2p)
+	crossing, above = _crossings(x, mid)
+	# last mid level crossing of each edge
+	at = _fill_forward(crossing)
+	i0, ok0 = _first(rising)
+	i1, ok1 = _last(rising)
+	rows = np.arange(n_frames)
+	c0 = at[rows, i0]
+	c1 = at[rows, i1]
+	n_edges = np.count_nonzero(rising, axis=1)
+	t0 = _interpolate(x, c0, mid)
+	t1 = _interpolate(x, c1, mid)
+	periods = n_edges - 1
+	with np.errstate(divide="ignore", invalid="ignore"):
+		out["frequency"] = np.where(periods > 0, periods * sample_rate / (t1 - t0), np.nan)
+
+		# time above mid level over whole periods
+		high = np.cumsum(above, axis=1)
+		n_high = high[rows, c1] - high[rows, c0]
+		out["duty"] = np.where(periods > 0, n_high / (c1 - c0), np.nan)
+
+	# 10-90 % rise time of the first edge crossing both levels: last
+	# 10 % crossing before its mid level crossing, and first 90 %
+	# crossing after
+	l10 = lo + 0.1 * p2p
+	l90 = lo + 0.9 * p2p
+	r10, _ = _crossings(x, l10)
+	r90, _ = _crossings(x, l90)
+	j10 = _take(_fill_forward(r10), at)
+	j, ok = _first(rising & (j10 >= 0))
+	c = at[rows, j]
+	j10 = j10[rows, j]
+	j90 = _fill_backward(r90)[rows, c]
+	ok &= j90 < n_samples - 1
+	t10 = _interpolate(x, np.maximum(j10, 0), l10)
+	t90 = _interpolate(x, np.minimum(j90, n_samples - 2), l90)
+	out["rise_time"] = np.where(ok, (t90 - t10) / sample_rate, np.nan)
+
+	return out
+
+
+def iter_measurements(frames, sample_rate, batch=64):
+	"""
+	Measure frames as they're acquired
+
+	:param frames: iterable of frames having a and b attributes,
+	 eg. scope_cgr101.Acquisition
+	:param sample_rate: sample rate (Hz)
+	:param batch: amount of frames measured at once
+	:return: iterator of arrays of measurement_dtype, with shape
+	 (frames, channels), the last one being possibly shorter
+	"""
+	stack = None
+	out = np.empty((2, batch), dtype=measurement_dtype)
+	n = 0
+	for frame in frames:
+		if stack is None:
+			stack = np.empty((2, batch, len(frame.a)), dtype=frame.a.dtype)
+		# copy, as the frame buffer is recycled by the acquisition
+		stack[0,n] = frame.a
+		stack[1,n] = frame.b
+		n += 1
+		if n == batch:
+			for idx_channel in range(2):
+				measure(stack[idx_channel], sample_rate, out=out[idx_channel])
+			yield out.T.copy()
+			n = 0
+
+	if n:
+		for idx_channel in range(2):
+			measure(stack[idx_channel,:n], sample_rate, out=out[idx_channel,:n])
+		yield out[:,:n].T.copy()
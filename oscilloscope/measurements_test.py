@@ -0,0 +1,69 @@
+import time
+import logging
+import collections
+
+import numpy as np
+import pytest
+
+from .measurements import measure, iter_measurements
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_measure():
+	fs = 1e6
+	t = np.arange(1024) / fs
+	f = np.array([10e3, 25e3, 3e3])
+	phase = (t[None,:] * f[:,None]) % 1
+	duty = np.array([0.5, 0.25, 0.7])
+	square = np.where(phase < duty[:,None], 1.0, 0.0)
+	sine = 2 * np.sin(2 * np.pi * f[:,None] * t[None,:] + 0.1) + 0.5
+
+	m = measure(square, fs)
+	# edges of a square wave are quantized to the sample period
+	np.testing.assert_allclose(m["frequency"], f, rtol=2e-3)
+	np.testing.assert_allclose(m["duty"], duty, atol=0.02)
+	np.testing.assert_allclose(m["p2p"], 1)
+
+	m = measure(sine, fs)
+	np.testing.assert_allclose(m["frequency"], f, rtol=1e-3)
+	np.testing.assert_allclose(m["duty"], 0.5, atol=0.02)
+	np.testing.assert_allclose(m["p2p"], 4, rtol=1e-2)
+	np.testing.assert_allclose(m["mean"], 0.5, atol=0.1)
+	# 10-90 % of a sine is asin(0.8)/π of the period
+	np.testing.assert_allclose(m["rise_time"], 2 * np.arcsin(0.8) / (2 * np.pi * f), rtol=0.02)
+
+	m = measure(np.zeros((2, 1024)), fs)
+	assert np.all(np.isnan(m["frequency"]))
+
+
+def test_measure_noise():
+	fs = 1e6
+	rng = np.random.default_rng(0)
+	t = np.arange(1024) / fs
+	f = 5e3
+	x = np.sin(2 * np.pi * f * t) + rng.normal(scale=0.02, size=(16, 1024))
+
+	m = measure(x, fs)
+	np.testing.assert_allclose(m["frequency"], f, rtol=1e-2)
+	np.testing.assert_allclose(m["duty"], 0.5, atol=0.02)
+	np.testing.assert_allclose(m["rise_time"], 2 * np.arcsin(0.8) / (2 * np.pi * f), rtol=0.1)
+
+
+def test_iter_measurements():
+	Frame = collections.namedtuple("Frame", "a b")
+	fs = 1e6
+	t = np.arange(1024) / fs
+	frames = [Frame(np.sin(2 * np.pi * 10e3 * t), np.sin(2 * np.pi * 20e3 * t)) for idx in range(150)]
+
+	t0 = time.monotonic()
+	res = list(iter_measurements(frames, fs, batch=64))
+	t1 = time.monotonic()
+	logger.info("Measured %d frames in %f s", len(frames), t1-t0)
+
+	assert [len(x) for x in res] == [64, 64, 22]
+	res = np.concatenate(res)
+	assert res.shape == (150, 2)
+	np.testing.assert_allclose(res["frequency"][:,0], 10e3, rtol=1e-3)
+	np.testing.assert_allclose(res["frequency"][:,1], 20e3, rtol=1e-3)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Persistence (2-D histogram) accumulation of scope frames
+# SPDX-License-Identifier: MIT
+
+"""
+Each (time, voltage) sample of incoming frames is counted in a fixed
+histogram of channels × voltage levels × samples, so memory use doesn't
+depend on the amount of frames.
+
+Counts are floating-point, so that older frames can be faded out by
+decay; samples outside of the voltage range are dropped and counted.
+
+"""
+
+import logging
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class Persistence:
+	def __init__(self, vmin=-1.0, vmax=1.0, levels=256, samples=1024, channels=2, decay=1.0):
+		"""
+		:param vmin: voltage of the bottom level
+		:param vmax: voltage of the top level
+		:param levels: amount of voltage bins
+		:param decay: factor applied to the histogram for each frame
+		 added, 1 for infinite persistence
+		"""
+		self.vmin = vmin
+		self.vmax = vmax
+		self.levels = levels
+		self.samples = samples
+		self.channels = channels
+		self.decay = decay
+		self.hist = np.zeros((channels, levels, samples), dtype=np.float32)
+		# flat index offsets of each sample of a frame
+		self._offsets = (np.arange(channels)[:,None] * levels * samples
+		 + np.arange(samples)[None,:])
+		self.count = 0
+		self.clipped = 0
+
+	def reset(self):
+		self.hist[...] = 0
+		self.count = 0
+		self.clipped = 0
+
+	def fade(self, factor):
+		"""
+		Scale the histogram down
+		"""
+		self.hist *= factor
+
+	def add(self, frames):
+		"""
+		Accumulate frames
+
+		:param frames: array of (frames ×) channels × samples
+		"""
+		frames = np.asarray(frames)
+		if frames.ndim == 2:
+			frames = frames[None]
+		m = len(frames)
+
+		scale = self.levels / (self.vmax - self.vmin)
+		levels = np.floor((frames - self.vmin) * scale)
+		valid = (levels >= 0) & (levels < self.levels)
+		idx = levels.astype(np.intp, copy=False)
+		idx *= self.samples
+		idx += self._offsets
+		idx = idx[valid]
+		self.clipped += valid.size - len(idx)
+
+		flat = self.hist.reshape(-1)
+		if self.decay == 1.0:
+			counts = np.bincount(idx, minlength=flat.size)
+		else:
+			# same as adding frames one by one: frame k of m has
+			# decayed m-1-k times by the end of the batch
+			self.fade(self.decay ** m)
+			weights = self.decay ** np.arange(m-1, -1, -1)
+			weights = np.broadcast_to(weights[:,None,None], valid.shape)[valid]
+			counts = np.bincount(idx, weights=weights, minlength=flat.size)
+		flat += counts.astype(np.float32, copy=False)
+		self.count += m
+
+	def image(self, channel=0, gamma=0.5, out=None):
+		"""
+		:param gamma: exponent applied to normalized counts, < 1 to
+		 make rare samples visible
+		:return: 8-bit intensity image of a channel, with the highest
+		 voltage on the first row
+		"""
+		h = self.hist[channel,::-1]
+		if out is None:
+			out = np.empty(h.shape, dtype=np.uint8)
+		peak = h.max()
+		if peak == 0:
+			out[...] = 0
+			return out
+		x = h * (1 / peak)
+		np.power(x, gamma, out=x)
+		x *= 255
+		np.rint(x, out=x)
+		out[...] = x
+		return out
+
+	def render(self, path, channel=0, gamma=0.5, cmap="inferno"):
+		"""
+		Save a channel as an image file (requires matplotlib)
+		"""
+		import matplotlib.image
+		matplotlib.image.imsave(path, self.image(channel, gamma), cmap=cmap, vmin=0, vmax=255)
+
+	def save(self, path):
+		"""
+		Save the histogram and its axes (.npz)
+		"""
+		np.savez(path, hist=self.hist, vmin=self.vmin, vmax=self.vmax,
+		 count=self.count, clipped=self.clipped)
+
+	@classmethod
+	def load(cls, path):
+		with np.load(path) as f:
+			channels, levels, samples = f["hist"].shape
+			self = cls(vmin=float(f["vmin"]), vmax=float(f["vmax"]),
+			 levels=levels, samples=samples, channels=channels)
+			self.hist[...] = f["hist"]
+			self.count = int(f["count"])
+			self.clipped = int(f["clipped"])
+		return self
@@ -0,0 +1,63 @@
+import logging
+
+import numpy as np
+import pytest
+
+from .persistence import Persistence
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_persistence(tmp_path):
+	rng = np.random.default_rng(0)
+	p = Persistence(vmin=-1, vmax=1, levels=64)
+	t = np.arange(1024)
+	for idx in range(10):
+		a = 0.5 * np.sin(2 * np.pi * t / 100 + rng.normal(scale=0.1, size=(16, 1)))
+		b = np.full((16, 1024), 2.0)
+		p.add(np.stack((a, b), axis=1))
+
+	assert p.count == 160
+	assert p.hist[0].sum() == 160 * 1024
+	assert p.hist[1].sum() == 0
+	assert p.clipped == 160 * 1024
+	# samples fall within ±0.5 V
+	rows = np.flatnonzero(p.hist[0].sum(axis=1))
+	assert rows.min() >= 16 and rows.max() < 48
+
+	img = p.image(0)
+	assert img.shape == (64, 1024)
+	assert img.max() == 255
+
+	p.save(tmp_path / "p.npz")
+	q = Persistence.load(tmp_path / "p.npz")
+	np.testing.assert_array_equal(q.hist, p.hist)
+	assert q.count == p.count
+
+	p.fade(0.5)
+	assert p.hist[0].sum() == 80 * 1024
+	p.reset()
+	assert p.hist.sum() == 0
+
+
+def test_decay():
+	frames = np.zeros((4, 2, 1024))
+	p = Persistence(decay=0.5)
+	for frame in frames:
+		p.add(frame)
+	np.testing.assert_allclose(p.hist[0,128], 0.125 + 0.25 + 0.5 + 1)
+
+	# independent of batching
+	q = Persistence(decay=0.5)
+	q.add(frames[0])
+	q.add(frames[1:])
+	np.testing.assert_allclose(q.hist, p.hist)
+
+
+def test_render(tmp_path):
+	pytest.importorskip("matplotlib")
+	p = Persistence()
+	p.add(np.zeros((2, 1024)))
+	p.render(tmp_path / "p.png")
+	assert (tmp_path / "p.png").stat().st_size > 0
@@ -8,15 +8,81 @@
 """
 
 import time
+import select
 import logging
+import threading
+import collections
 
 import numpy as np
+import serial
 
 
 logger = logging.getLogger(__name__)
 
 
+def waveform_codes(x):
+	"""
+	:param x: waveform table, either generator codes (integers in
+	 0..255) or 256 floating-point values in [-1, 1]
+	:return: generator codes
+	"""
+	x = np.asarray(x)
+	if x.shape != (256,):
+		raise ValueError(f"Waveform table must have 256 entries, not {x.shape}")
+	if x.dtype == np.uint8:
+		return x
+	if np.issubdtype(x.dtype, np.integer):
+		if x.min() < 0 or x.max() > 255:
+			raise ValueError("Waveform codes must be in 0..255")
+		return x.astype(np.uint8)
+	return np.uint8(np.round(128 + np.clip(x, -1, 1) * 127))
+
+
+def waveform_commands(codes, size=256):
+	"""
+	:param codes: generator codes
+	:param size: max. amount of bytes per write
+	:return: list of writes programming the waveform RAM, each made of
+	 whole commands
+	"""
+	chunks = []
+	chunk = b""
+	for a, v in enumerate(codes.tolist()):
+		req = b"W S %d %d\n" % (a, v)
+		if chunk and len(chunk) + len(req) > size:
+			chunks.append(chunk)
+			chunk = b""
+		chunk += req
+	chunks.append(chunk)
+	return chunks
+
+
+_phase = np.arange(256) / 256
+
+waveforms = {
+ "sine": waveform_codes(np.sin(2 * np.pi * _phase)),
+ "square": waveform_codes(np.where(_phase < 0.5, 1.0, -1.0)),
+ "triangle": waveform_codes(1 - 4 * np.abs(_phase - 0.5)),
+ "sawtooth": waveform_codes(2 * _phase - 1),
+}
+
+
 class Scope:
+	# max. amount of bytes per write when programming the waveform RAM.
+	# At 230400 Bd a W S command (~10 bytes) takes ~0.4 ms on the wire,
+	# and the firmware only stores the entry, without replying, so it
+	# keeps up with back-to-back commands; _write() still paces the
+	# writes by 1 ms. Set to 1 for one paced write per entry, as before.
+	waveform_write_size = 256
+
+	# waveform RAM programming writes, by table and write size,
+	# precomputed for named waveforms
+	_waveform_writes = {
+	 (codes.tobytes(), size): waveform_commands(codes, size)
+	 for size in (waveform_write_size,)
+	 for codes in waveforms.values()
+	}
+
 	def __init__(self, ser):
 		self.ser = ser
 		self.adstepsize = [0,0]
@@ -28,6 +94,12 @@ class Scope:
 		 1: 0.0521, # "high"
 		}
 		self._pos = 0
+		self.trigger_latency = None
+		self._armed_at = None
+		self._raw = np.empty((1024, 2), dtype=">u2")
+		self._codes = np.empty((2, 1024), dtype=np.intp)
+		self._luts = dict()
+		self._waveform = None
 
 	def __enter__(self):
 
@@ -74,6 +146,19 @@ class Scope:
 		logger.debug("< %s", x[:64])
 		return x
 
+	def _readinto(self, arr):
+		"""
+		Read exactly enough to fill contiguous array arr
+		"""
+		logger.debug("? %d", arr.nbytes)
+		mv = memoryview(arr.view(np.uint8).reshape(-1))
+		n = 0
+		while n < len(mv):
+			r = self.ser.readinto(mv[n:])
+			if not r:
+				raise TimeoutError(f"Got {n} of {len(mv)} bytes")
+			n += r
+
 	def identify(self):
 		self._write(b"i\n")
 		return self._readline().rstrip()
@@ -131,7 +216,38 @@ class Scope:
 		self._sample_rate = candidate
 		return candidate
 
-	def waveform_configure(self, freq=1000, noise=False):
+	def waveform_upload(self, table):
+		"""
+		Program the generator waveform RAM
+
+		:param table: waveform table (see waveform_codes()) or name of
+		 a waveform in waveforms
+		:return: whether the table was sent, which is not the case when
+		 it's the last one uploaded
+		"""
+		if isinstance(table, str):
+			table = waveforms[table]
+		codes = waveform_codes(table)
+		key = codes.tobytes()
+		if key == self._waveform:
+			return False
+
+		size = self.waveform_write_size
+		writes = self._waveform_writes.get((key, size))
+		if writes is None:
+			writes = waveform_commands(codes, size)
+			if len(self._waveform_writes) < 64:
+				self._waveform_writes[key, size] = writes
+
+		for x in writes:
+			self._write(x)
+		self._waveform = key
+		return True
+
+	def waveform_configure(self, freq=1000, noise=False, table=None):
+		"""
+		:param table: optional waveform table, see waveform_upload()
+		"""
 		phase = int(round(freq / 0.09313225746))
 		logger.debug("Phase: %f", phase)
 
@@ -145,13 +261,8 @@ class Scope:
 		#ampl = 1
 		self._write(f"W A {ampl}\n".encode())
 
-		if 0:
-			addr = np.arange(256)
-			val = np.sin(2 * np.pi * addr / 256)
-			val = np.int32(np.round(128 + val * 127))
-			for a, v in zip(addr, val):
-				req = f"W S {a} {v}\n".encode()
-				self._write(req)
+		if table is not None:
+			self.waveform_upload(table)
 
 		self._write(b"W P\n")
 
@@ -190,32 +301,76 @@ class Scope:
 		"""
 		Capture using external trigger
 		"""
+		self.wait_trigger()
+
+	def arm(self):
+		"""
+		Arm for capture using external trigger
+		"""
 		if not self.external_trigger:
 			self._set_control_register(external_trigger=1)
-
 		logger.debug("Trigger?")
 		self._write(b"S G\n")
-		while True:
+		self._armed_at = time.monotonic()
+		self._pulse()
 
-			self._write(b"S D 5\n")
-			self._write(b"S D 4\n")
+	def _pulse(self):
+		self._write(b"S D 5\n")
+		self._write(b"S D 4\n")
 
-			sample_period = 1 / self._sample_rate
-			period = 1024 * sample_period
+	def _wait_readable(self, timeout):
+		"""
+		Wait for data from the scope, blocking on the port
+		:return: whether there's data
+		"""
+		if self.ser.in_waiting:
+			return True
+		if not isinstance(self.ser, serial.Serial):
+			# eg. loop:// or a record/replay proxy, only poll through
+			# the serial API
+			time.sleep(min(timeout, 0.001))
+			return self.ser.in_waiting > 0
+		r, w, x = select.select([self.ser.fileno()], [], [], timeout)
+		return bool(r)
+
+	def wait_trigger(self, timeout=None, arm=True):
+		"""
+		Wait for external trigger, blocking on the port, and pulsing
+		again only when a frame period went by without trigger.
 
-			time.sleep(period * 0.1)
+		:param timeout: max. time to wait (s), None to wait forever
+		:param arm: whether to arm first, else keep waiting after a
+		 previous call timed out (arming anyway when not armed)
+		:return: trigger latency since arming (s), or None on timeout
+		"""
+		if arm or self._armed_at is None:
+			self.arm()
 
-			self.ser.timeout = 0.1
-			x = self._read(1)
-			if not x:
-				continue
-			self.ser.timeout = None
-			assert x == b"A", x
-			logger.debug("Trigger! %s", x)
-			d = self._read(2)
-			self._pos = 1023-int.from_bytes(d, "big")
-			logger.debug("Trigger! %s=%s", d, self._pos)
-			break
+		now = time.monotonic()
+		deadline = None if timeout is None else now + timeout
+		repulse = max(1.5 * 1024 * 2**self.sample_rate_div / 20e6, 0.01)
+		next_pulse = now + repulse
+		while True:
+			wait = next_pulse - now
+			if deadline is not None:
+				wait = min(wait, deadline - now)
+			if self._wait_readable(max(wait, 0)):
+				break
+			now = time.monotonic()
+			if deadline is not None and now >= deadline:
+				return None
+			if now >= next_pulse:
+				self._pulse()
+				next_pulse = now + repulse
+
+		x = self._read(1)
+		assert x == b"A", x
+		self.trigger_latency = time.monotonic() - self._armed_at
+		self._armed_at = None
+		d = self._read(2)
+		self._pos = 1023-int.from_bytes(d, "big")
+		logger.debug("Trigger! %s=%s after %f s", d, self._pos, self.trigger_latency)
+		return self.trigger_latency
 
 
 	def capture(self):
@@ -232,8 +387,50 @@ class Scope:
 		logger.debug("Trigger! %s=%s", d, self._pos)
 
 
-	def read_data_buffer(self):
+	def lut(self, idx_channel):
 		"""
+		:return: table of voltage per 10-bit sample code, for the
+		 present gain and calibration of a channel
+		"""
+		key = (
+		 idx_channel,
+		 self.adstepsize[idx_channel],
+		 self.bias[idx_channel][self.scaler[idx_channel]],
+		)
+		try:
+			return self._luts[key]
+		except KeyError:
+			pass
+		step, bias = key[1:]
+		lut = (511 - np.arange(1024, dtype=np.float32)) * np.float32(step) - np.float32(bias)
+		self._luts[key] = lut
+		return lut
+
+	def convert(self, raw, pos, a, b):
+		"""
+		Convert raw buffer contents to voltages
+
+		:param raw: (1024, 2) array of sample codes, as stored
+		:param pos: trigger position, buffer rotation
+		:param a: output array for channel A
+		:param b: output array for channel B
+		"""
+		codes = self._codes
+		n = raw.shape[0]
+		if not 0 <= pos < n:
+			raise ValueError(f"Trigger position {pos} out of 0..{n-1}")
+		# rotation, ie. np.roll(raw, pos, axis=0), done while casting
+		codes[:, pos:] = raw[:n-pos].T
+		codes[:, :pos] = raw[n-pos:].T
+		# samples are 10-bit, ignore stray high bits
+		codes &= 0x3ff
+		np.take(self.lut(0), codes[0], out=a)
+		np.take(self.lut(1), codes[1], out=b)
+
+	def read_data_buffer(self, out=None):
+		"""
+		:param out: optional (2, 1024) float32 array to fill, or pair
+		 of arrays, so that no memory is allocated
 		:return: an array for each channel
 		Takes about 194 ms
 		"""
@@ -241,12 +438,161 @@ class Scope:
 		self._write(b"S B \n")
 		x = self._read(1)
 		assert x == b"D", x
-		data = self._read(4096)
-		arr = np.frombuffer(data, dtype=">H").reshape((-1, 2))
+		self._readinto(self._raw)
 
-		arr = np.roll(arr, self._pos, axis=0)
-		A, B = arr.T
-		a = (511 - np.float32(A)) * self.adstepsize[0] - self.bias[0][self.scaler[0]]
-		b = (511 - np.float32(B)) * self.adstepsize[1] - self.bias[1][self.scaler[1]] 
+		if out is None:
+			out = np.empty((2, 1024), dtype=np.float32)
+		a, b = out
+		self.convert(self._raw, self._pos, a, b)
 		return a, b
 
+
+Frame = collections.namedtuple("Frame", ("a", "b", "pos", "timestamp", "index"))
+
+
+class Acquisition:
+	"""
+	Continuous acquisition, in a background thread owning the scope.
+
+	Frames are downloaded into a ring of preallocated buffers, and
+	the trigger is re-armed as soon as a buffer is downloaded.
+	Consumers iterate frames, each one being valid until the next one
+	is requested; if they don't keep up, the oldest pending frames are
+	dropped (and counted) rather than holding acquisition.
+
+	.. code:: python
+
+	   with Acquisition(scope) as acq:
+	       for frame in acq:
+	           ...
+
+	The scope must not be used otherwise while acquisition runs.
+	"""
+	def __init__(self, scope, depth=8, internal_trigger=False):
+		"""
+		:param depth: amount of frame buffers, at least 2
+		:param internal_trigger: use capture() rather than trigger()
+		"""
+		if depth < 2:
+			raise ValueError("Need at least 2 buffers")
+		self.scope = scope
+		self.depth = depth
+		self._internal_trigger = internal_trigger
+		self.data = np.zeros((depth, 2, 1024), dtype=np.float32)
+		self.pos = np.zeros(depth, dtype=np.int32)
+		self.timestamps = np.zeros(depth)
+		self.indices = np.zeros(depth, dtype=np.int64)
+		self._cond = threading.Condition()
+		self._free = collections.deque(range(depth))
+		self._ready = collections.deque()
+		self._held = None
+		self._error = None
+		self.acquired = 0
+		self.consumed = 0
+		self.dropped = 0
+		self.skipped = 0
+		self.running = False
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, exc_type, exc_value, exc_traceback):
+		self.stop()
+
+	def start(self):
+		self.running = True
+		self._thread = threading.Thread(target=self.run, daemon=True)
+		self._thread.start()
+
+	def stop(self, timeout=5):
+		with self._cond:
+			self.running = False
+			self._cond.notify_all()
+		self._thread.join(timeout)
+		if self._thread.is_alive():
+			logger.warning("Acquisition thread still waiting for the scope")
+
+	def _slot(self):
+		"""
+		:return: buffer to fill, dropping the oldest pending frame if
+		 there's no free buffer
+		"""
+		with self._cond:
+			if self._free:
+				return self._free.popleft()
+			self.dropped += 1
+			return self._ready.popleft()
+
+	def run(self):
+		scope = self.scope
+		try:
+			while self.running:
+				if self._internal_trigger:
+					scope.capture()
+				else:
+					arm = True
+					while self.running:
+						if scope.wait_trigger(timeout=0.1, arm=arm) is not None:
+							break
+						arm = False
+					else:
+						break
+				t = time.monotonic()
+				slot = self._slot()
+				scope.read_data_buffer(out=self.data[slot])
+				self.pos[slot] = scope._pos
+				self.timestamps[slot] = t
+				self.indices[slot] = self.acquired
+				with self._cond:
+					self.acquired += 1
+					self._ready.append(slot)
+					self._cond.notify_all()
+		except Exception as e:
+			logger.exception("Acquisition error: %s", e)
+			with self._cond:
+				self._error = e
+				self.running = False
+				self._cond.notify_all()
+
+	def get(self, timeout=None):
+		"""
+		:return: next frame, or None on timeout / when stopped
+		"""
+		with self._cond:
+			if self._held is not None:
+				self._free.append(self._held)
+				self._held = None
+			if not self._cond.wait_for(lambda: self._ready or not self.running, timeout):
+				return None
+			if self._error is not None:
+				raise RuntimeError("Acquisition failed") from self._error
+			if not self._ready:
+				return None
+			slot = self._held = self._ready.popleft()
+			self.consumed += 1
+		return Frame(
+		 self.data[slot, 0],
+		 self.data[slot, 1],
+		 int(self.pos[slot]),
+		 float(self.timestamps[slot]),
+		 int(self.indices[slot]),
+		)
+
+	def get_latest(self, timeout=None):
+		"""
+		:return: most recent frame, skipping (and counting) older
+		 pending ones, or None on timeout / when stopped
+		"""
+		with self._cond:
+			while len(self._ready) > 1:
+				self._free.append(self._ready.popleft())
+				self.skipped += 1
+		return self.get(timeout)
+
+	def __iter__(self):
+		while True:
+			frame = self.get()
+			if frame is None:
+				break
+			yield frame
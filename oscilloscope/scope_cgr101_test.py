@@ -5,7 +5,7 @@ import serial
 import numpy as np
 import pytest
 
-from .circuitgear_cgr101 import Scope
+from .scope_cgr101 import Scope, Acquisition
 
 
 logger = logging.getLogger(__name__)
@@ -26,6 +26,15 @@ def scope():
 			yield s
 
 
+@pytest.fixture
+def sim_scope():
+	from ..simulator.sim_cgr101 import CGR101
+	with CGR101() as sim:
+		with serial.Serial(port=sim.path, baudrate=230400) as ser:
+			with Scope(ser) as s:
+				yield s
+
+
 def plot(scope, name, title=""):
 	a0, b0 = scope.read_data_buffer()
 	t = np.arange(1024) / scope.get_sample_rate()
@@ -144,52 +153,139 @@ def test_refresh_rate(scope):
 	logger.info("Read %d frames in %f s, ie. %f frame/s", n, t1-t0, n/(t1-t0))
 
 
+def test_convert():
+	s = Scope(None)
+	s.scaler = [0, 1]
+	s.adstepsize = [s.gains[0], s.gains[1]]
+	s.bias = [[0.038,0.0521], [0.015,-0.0521]]
+	raw = np.random.randint(0, 1024, (1024, 2)).astype(">u2")
+	out = np.empty((2, 1024), dtype=np.float32)
+	for pos in (0, 1, 512, 1023):
+		s.convert(raw, pos, *out)
+		A, B = np.roll(raw, pos, axis=0).T
+		a = (511 - np.float32(A)) * s.adstepsize[0] - s.bias[0][s.scaler[0]]
+		b = (511 - np.float32(B)) * s.adstepsize[1] - s.bias[1][s.scaler[1]]
+		np.testing.assert_array_equal(out[0], a)
+		np.testing.assert_array_equal(out[1], b)
+
+	# stray high bits are ignored
+	s.convert(raw | 0xfc00, 0, *out)
+	np.testing.assert_array_equal(out[0], (511 - np.float32(raw[:,0])) * s.adstepsize[0] - s.bias[0][0])
+
+	with pytest.raises(ValueError):
+		s.convert(raw, 1024, *out)
+
+
+def test_acquisition(sim_scope):
+	scope = sim_scope
+	scope.set_frame_period(0.001)
+
+	n = 20
+	t0 = time.monotonic()
+	with Acquisition(scope, depth=4) as acq:
+		for idx, frame in enumerate(acq):
+			assert frame.a.shape == (1024,)
+			assert 0 <= frame.pos < 1024
+			time.sleep(0.01)
+			if idx == n - 1:
+				break
+	t1 = time.monotonic()
+
+	logger.info("Consumed %d frames in %f s, acquired %d, dropped %d",
+	 acq.consumed, t1-t0, acq.acquired, acq.dropped)
+	assert acq.consumed == n
+	assert acq.acquired >= acq.consumed + acq.dropped
+
+
 def test_tk(scope):
 	scope.scale("A", 0)
 	scope.scale("B", 0)
 	scope.waveform_configure(noise=False)
 	sp = scope.set_frame_period(0.01)
 	logger.info("Capture period: %s", sp)
-	import matplotlib.pyplot as plt
+	import matplotlib.figure
 	from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 	import tkinter as tk
-	import numpy as np
-
-	class Application(tk.Frame):
-		def __init__(self, master=None):
-			tk.Frame.__init__(self,master)
-			self.createWidgets()
-
-		def createWidgets(self):
-			fig=plt.figure(figsize=(8,8))
-			ax=fig.add_axes([0.1,0.1,0.8,0.8])
-			canvas=FigureCanvasTkAgg(fig,master=root)
-			canvas.get_tk_widget().grid(row=0,column=1)
-			canvas.draw()
-			self.canvas = canvas
-			self.ax = ax
-			self.plots = [
-			 ax.plot([], [], label="A")[0],
-			 ax.plot([], [], label="B")[0],
-			]
-			ax.set_xlim(0, sp)
-			ax.set_ylim(-1,1)
-
-			scope.trigger()
-			self.after(1, self.refresh)
-
-		def refresh(self):
-			a, b = scope.read_data_buffer()
-			scope.trigger()
-			t = np.arange(1024) / scope.get_sample_rate()
-			self.plots[0].set_xdata(t)
-			self.plots[0].set_ydata(a)
-			self.plots[1].set_xdata(t)
-			self.plots[1].set_ydata(b)
-			self.canvas.draw()
-
-			self.after(1, self.refresh)
-
-	root=tk.Tk()
-	app=Application(master=root)
-	app.mainloop()
+	from .viewer import Viewer
+
+	root = tk.Tk()
+	fig = matplotlib.figure.Figure(figsize=(8,8))
+	canvas = FigureCanvasTkAgg(fig, master=root)
+	canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+	with Acquisition(scope) as acq:
+		viewer = Viewer(fig, acq)
+		canvas.draw()
+		viewer.start()
+		root.mainloop()
+		viewer.stop()
+
+
+def test_wait_trigger(sim_scope):
+	scope = sim_scope
+	scope.set_frame_period(0.001)
+
+	latencies = []
+	for idx in range(10):
+		latency = scope.wait_trigger(timeout=1)
+		assert latency is not None
+		scope.read_data_buffer()
+		latencies.append(latency)
+	logger.info("Trigger latency: %s", latencies)
+	assert max(latencies) < 0.1
+
+	# not armed yet
+	assert scope.wait_trigger(timeout=1, arm=False) is not None
+	scope.read_data_buffer()
+
+	# stop() doesn't wait for a trigger that never comes
+	with Acquisition(scope, depth=2) as acq:
+		pass
+
+
+def test_waveform_codes():
+	from .scope_cgr101 import waveform_codes
+	codes = np.arange(256)
+	for table in (codes, codes.tolist(), codes.astype(np.int16)):
+		np.testing.assert_array_equal(waveform_codes(table), codes)
+	with pytest.raises(ValueError):
+		waveform_codes(codes + 1)
+	with pytest.raises(ValueError):
+		waveform_codes(codes - 1)
+	np.testing.assert_array_equal(waveform_codes(np.zeros(256)), 128)
+
+
+def test_waveform_upload():
+	from ..simulator.sim_cgr101 import CGR101
+	from .scope_cgr101 import waveforms
+	with CGR101() as sim:
+		with serial.Serial(port=sim.path, baudrate=230400) as ser:
+			with Scope(ser) as scope:
+				for name in ("square", "sine"):
+					assert scope.waveform_upload(name)
+					assert not scope.waveform_upload(waveforms[name])
+				table = np.linspace(-1, 1, 256)
+				assert scope.waveform_upload(table)
+				scope.identify()
+				np.testing.assert_allclose(sim.table, table, atol=1/127)
+
+
+def test_replay(tmp_path):
+	from ..simulator.sim_cgr101 import CGR101
+	from ..scpi.replay import record, replay
+	path = tmp_path / "cgr101.rec.gz"
+	with CGR101() as sim:
+		with serial.Serial(port=sim.path, baudrate=230400) as ser, record(ser, path) as ser:
+			with Scope(ser) as scope:
+				scope.set_frame_period(0.001)
+				scope.wait_trigger(timeout=1)
+				a0, b0 = scope.read_data_buffer()
+				a0, b0 = a0.copy(), b0.copy()
+
+	with replay(path) as ser:
+		with Scope(ser) as scope:
+			scope.set_frame_period(0.001)
+			scope.wait_trigger(timeout=1)
+			a1, b1 = scope.read_data_buffer()
+	np.testing.assert_array_equal(a0, a1)
+	np.testing.assert_array_equal(b0, b1)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Spectrum analysis of scope frames
+# SPDX-License-Identifier: MIT
+
+"""
+Spectrum analyzer mode: frames are windowed and transformed in batches,
+and power spectra are accumulated in place into a running average
+and a peak hold.
+
+Power is one-sided, scaled so that a sine of amplitude A yields A²/2
+at its frequency (ie. V² RMS), and given in dB relative to 1 V² RMS.
+
+Windows and frequency axes are cached, per length and sample rate;
+the CGR-101 sample rates being few (see Scope.set_sample_rate()),
+so are the cache entries.
+
+"""
+
+import logging
+import functools
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=16)
+def window(name, n):
+	"""
+	:param name: numpy window function name, eg. "hanning", or "boxcar"
+	:return: read-only window, scaled for one-sided power spectra
+	"""
+	if name == "boxcar":
+		w = np.ones(n)
+	else:
+		w = getattr(np, name)(n)
+	w = w * np.sqrt(2) / w.sum()
+	w.flags.writeable = False
+	return w
+
+
+@functools.lru_cache(maxsize=16)
+def frequencies(sample_rate, n):
+	"""
+	:return: read-only frequency axis of an rfft of n samples
+	"""
+	f = np.fft.rfftfreq(n, 1 / sample_rate)
+	f.flags.writeable = False
+	return f
+
+
+class Spectrum:
+	def __init__(self, n=1024, channels=2, window="hanning", average=16):
+		"""
+		:param n: samples per frame
+		:param window: window function name, see window()
+		:param average: amount of frames averaged; past that, the
+		 average becomes exponential with a time constant of as many
+		 frames
+		"""
+		self.n = n
+		self.window_name = window
+		self.average = average
+		self.power = np.zeros((channels, n//2+1))
+		self.peak = np.zeros((channels, n//2+1))
+		self.sample_rate = None
+		self.count = 0
+		self._batch = np.empty((0, channels, n))
+		self._tmp = np.empty((channels, n//2+1))
+
+	def reset(self):
+		self.power[...] = 0
+		self.peak[...] = 0
+		self.count = 0
+
+	@property
+	def frequencies(self):
+		return frequencies(self.sample_rate, self.n)
+
+	def add(self, frames, sample_rate):
+		"""
+		Accumulate frames
+
+		:param frames: array of frames × channels × samples
+		:param sample_rate: sample rate (Hz); the accumulators are
+		 reset when it changes
+		"""
+		if sample_rate != self.sample_rate:
+			self.reset()
+			self.sample_rate = sample_rate
+
+		m = len(frames)
+		if len(self._batch) != m:
+			self._batch = np.empty((m,) + self.power.shape[:1] + (self.n,))
+		x = self._batch
+		np.multiply(frames, window(self.window_name, self.n), out=x)
+		X = np.fft.rfft(x, axis=-1)
+		p = X.real ** 2
+		p += X.imag ** 2
+		# DC and Nyquist have no negative frequency counterpart
+		p[...,0] *= 0.5
+		if self.n % 2 == 0:
+			p[...,-1] *= 0.5
+
+		np.maximum(self.peak, p.max(axis=0), out=self.peak)
+
+		# running average, exponential past average frames
+		self.count += m
+		tmp = self._tmp
+		p.sum(axis=0, out=tmp)
+		tmp -= m * self.power
+		tmp *= 1 / max(min(self.count, self.average), m)
+		self.power += tmp
+
+	def power_db(self, out=None):
+		"""
+		:return: average power (dB)
+		"""
+		return _db(self.power, out)
+
+	def peak_db(self, out=None):
+		"""
+		:return: peak hold power (dB)
+		"""
+		return _db(self.peak, out)
+
+
+def _db(x, out):
+	if out is None:
+		out = np.empty_like(x)
+	np.maximum(x, 1e-30, out=out)
+	np.log10(out, out=out)
+	out *= 10
+	return out
+
+
+def iter_spectra(frames, scope, spectrum=None, batch=16):
+	"""
+	Accumulate spectra from acquired frames
+
+	:param frames: iterable of frames having a and b attributes,
+	 eg. scope_cgr101.Acquisition
+	:param scope: the scope, providing the sample rate
+	:param batch: amount of frames transformed at once
+	:return: iterator of the Spectrum, updated after each batch
+	"""
+	if spectrum is None:
+		spectrum = Spectrum()
+	stack = np.empty((batch, 2, spectrum.n), dtype=np.float32)
+	n = 0
+	for frame in frames:
+		# copy, as the frame buffer is recycled by the acquisition
+		stack[n,0] = frame.a
+		stack[n,1] = frame.b
+		n += 1
+		if n == batch:
+			spectrum.add(stack, scope.get_sample_rate())
+			n = 0
+			yield spectrum
+	if n:
+		spectrum.add(stack[:n], scope.get_sample_rate())
+		yield spectrum
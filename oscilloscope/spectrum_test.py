@@ -0,0 +1,53 @@
+import time
+import logging
+import collections
+
+import numpy as np
+
+from .spectrum import Spectrum, iter_spectra, window
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_spectrum():
+	fs = 1.25e6
+	n = 1024
+	t = np.arange(n) / fs
+	f0 = 100 * fs / n
+	rng = np.random.default_rng(0)
+
+	spectrum = Spectrum(window="boxcar", average=8)
+	for idx in range(4):
+		a = np.sin(2 * np.pi * f0 * t + rng.uniform(0, 2 * np.pi, size=(16, 1)))
+		b = 0.1 * a + rng.normal(scale=0.01, size=(16, n))
+		spectrum.add(np.stack((a, b), axis=1), fs)
+	assert spectrum.count == 64
+
+	f = spectrum.frequencies
+	p = spectrum.power_db()
+	assert f[np.argmax(p[0])] == f0
+	np.testing.assert_allclose(p[0,100], 10 * np.log10(0.5), atol=0.01)
+	np.testing.assert_allclose(p[1,100], 10 * np.log10(0.5 * 0.01), atol=0.1)
+	assert np.all(spectrum.peak >= spectrum.power)
+
+	spectrum.add(np.zeros((1, 2, n)), fs / 2)
+	assert spectrum.count == 1
+	assert np.all(spectrum.power == 0)
+
+
+def test_iter_spectra():
+	Frame = collections.namedtuple("Frame", "a b")
+	class scope:
+		def get_sample_rate():
+			return 1e6
+
+	t = np.arange(1024)
+	frames = [Frame(np.sin(t / 10), np.cos(t / 10)) for idx in range(100)]
+	t0 = time.monotonic()
+	for spectrum in iter_spectra(frames, scope, batch=16):
+		pass
+	t1 = time.monotonic()
+	logger.info("Transformed %d frames in %f s", len(frames), t1-t0)
+	assert spectrum.count == 100
+	assert window("hanning", 1024) is window("hanning", 1024)
@@ -6,12 +6,108 @@
 >>> ins.ask("MEASUrement:MEAS2:VALue?")
 '-4.78191301E-2'
 
+# To poll several slots continuously, see MeasurementMonitor.
+
 """
 
+import time
+import logging
+import collections
+
+import numpy as np
+
+from ..scpi.batch import compound
+
+
+logger = logging.getLogger(__name__)
+
+
+def split_preamble(x):
+	"""
+	Split a ;-separated preamble, keeping quoted strings whole
+	"""
+	out = []
+	cur = ""
+	quoted = False
+	for c in x:
+		if c == '"':
+			quoted = not quoted
+		if c == ";" and not quoted:
+			out.append(cur)
+			cur = ""
+		else:
+			cur += c
+	out.append(cur)
+	return out
+
+
+def preamble_dtype(byt_nr, enc, bn_fmt, byt_or):
+	"""
+	:return: NumPy dtype of curve data described by preamble fields
+	"""
+	kinds = {"RI": "i", "RP": "u"}
+	orders = {"MSB": ">", "LSB": "<"}
+	if enc != "BIN" or bn_fmt not in kinds or byt_or not in orders:
+		raise ValueError(f"Unsupported curve format {enc};{bn_fmt};{byt_or}")
+	return np.dtype(f"{orders[byt_or]}{kinds[bn_fmt]}{byt_nr}")
+
+
+Preamble = collections.namedtuple("Preamble", (
+ "byt_nr", "bit_nr", "encdg", "bn_fmt", "byt_or", "nr_pt", "wfid",
+ "pt_fmt", "xincr", "pt_off", "xzero", "xunit", "ymult", "yzero",
+ "yoff", "yunit",
+))
+
+
+def parse_preamble(x):
+	"""
+	:param x: WFMPre? response
+	:return: Preamble
+	"""
+	fields = split_preamble(x)
+	if len(fields) != len(Preamble._fields):
+		raise ValueError(f"Unexpected preamble {x!r}")
+	byt_nr, bit_nr, encdg, bn_fmt, byt_or, nr_pt, wfid, pt_fmt, \
+	 xincr, pt_off, xzero, xunit, ymult, yzero, yoff, yunit = fields
+	return Preamble(
+	 int(byt_nr), int(bit_nr), encdg, bn_fmt, byt_or, int(nr_pt),
+	 wfid.strip('"'), pt_fmt, float(xincr), int(float(pt_off)),
+	 float(xzero), xunit.strip('"'), float(ymult), float(yzero),
+	 float(yoff), yunit.strip('"'),
+	)
+
+
+def source_name(source):
+	"""
+	:param source: channel number, or source name (eg. "MATH", "REFA")
+	:return: source name, as used by DATa:SOUrce
+	"""
+	if isinstance(source, int):
+		return f"CH{source}"
+	return source.upper()
+
+
+def source_id(name):
+	"""
+	:param name: source name, as returned by DATa:SOUrce?
+	:return: channel number for channels, else the name
+	"""
+	name = name.strip().upper()
+	if name.startswith("CH") and name[2:].isdigit():
+		return int(name[2:])
+	return name
+
 
 class Scope:
+	"""
+	Waveform sources are designated by channel number, or by name for
+	others (eg. "MATH", "REFA").
+	"""
 	def __init__(self, scpi):
 		self.s = scpi
+		# per source, (preamble, dtype, time axis)
+		self._preambles = dict()
+		self._source = None
 
 	def __enter__(self):
 		self.s.ask("*IDN?")
@@ -28,10 +124,199 @@ class Scope:
 		b = self.s.read_raw(400000)
 		return b
 
-	def curve(self) -> bytes:
+	def write(self, cmd):
+		"""
+		Send a setting command, forgetting the waveform preambles it
+		may change; use this rather than the SCPI interface directly,
+		or call invalidate().
+		"""
+		self.invalidate()
+		self.s.write(cmd)
+
+	def invalidate(self, channel=None):
+		"""
+		Forget cached preambles, eg. after changing settings from the
+		front panel
+
+		:param channel: source, all by default
+		"""
+		if channel is None:
+			self._preambles.clear()
+			self._source = None
+		else:
+			self._preambles.pop(source_id(source_name(channel)), None)
+
+	def data_source(self):
+		"""
+		:return: waveform source
+		"""
+		if self._source is None:
+			self._source = source_id(self.s.ask("DATa:SOUrce?"))
+		return self._source
+
+	def preamble(self, channel=None):
+		"""
+		:param channel: source, by default the waveform source
+		:return: Preamble, cached
+		"""
+		return self._waveform_format(channel)[0]
+
+	def _waveform_format(self, channel=None):
+		if channel is None:
+			channel = self.data_source()
+		channel = source_id(source_name(channel))
+		res = self._preambles.get(channel)
+		if res is not None:
+			return res
+		if channel != self.data_source():
+			self.s.write(f"DATa:SOUrce {source_name(channel)}")
+			self._source = channel
+		p = parse_preamble(self.s.ask("WFMPre?"))
+		dtype = preamble_dtype(p.byt_nr, p.encdg, p.bn_fmt, p.byt_or)
+		t = p.xzero + (np.arange(p.nr_pt) - p.pt_off) * p.xincr
+		t.flags.writeable = False
+		res = self._preambles[channel] = (p, dtype, t)
+		return res
+
+	def channels(self):
+		"""
+		:return: numbers of enabled channels
+		"""
+		cmds = [ f"SELect:CH{channel}?" for channel in (1, 2) ]
+		return [ channel for channel, x in zip((1, 2), self.s.ask_many(cmds))
+		 if x.strip() in ("1", "ON") ]
+
+	def curve_raw(self, dtype=">i2") -> np.ndarray:
+		"""
+		:return: curve data points, unscaled
+		"""
 		self.s.write("CURVE?")
-		data = self.s.read_raw(400000)
-		return data
+		return self.s.read_block(dtype)
+
+	def curve(self) -> np.ndarray:
+		"""
+		:return: curve data, scaled to vertical units
+		"""
+		p, dtype, t = self._waveform_format()
+		raw = self.curve_raw(dtype)
+		return (raw - p.yoff) * p.ymult + p.yzero
+
+	def acquire(self, channels=None):
+		"""
+		Read the waveforms of several channels
+
+		:param channels: sources, by default enabled channels
+		:return: dict of source to (time, voltage) arrays
+		"""
+		if channels is None:
+			channels = self.channels()
+		res = dict()
+		for channel in channels:
+			p, dtype, t = self._waveform_format(channel)
+			channel = source_id(source_name(channel))
+			if channel == self._source:
+				self.s.write("CURVe?")
+			else:
+				self.s.write(compound([f"DATa:SOUrce {source_name(channel)}", "CURVe?"]))
+				self._source = channel
+			raw = self.s.read_block(dtype)
+			v = raw - p.yoff
+			v *= p.ymult
+			v += p.yzero
+			res[channel] = (t, v)
+		return res
 
 	"WFMPre?"
 	'2;16;BIN;RI;MSB;2500;"Ch2, DC coupling, 2.0E0 V/div, 5.0E-4 s/div, 2500 points, Sample mode";Y;2.0E-6;0;-1.67E-3;"s";3.125E-4;0.0E0;-2.2528E4;"Volts"'
+
+
+class MeasurementMonitor:
+	"""
+	Poll measurement slots, reading them all with one compound query
+	per cycle, into a timestamped ring buffer.
+
+	.. code:: python
+
+	   with MeasurementMonitor(scope, [("MEAN", "CH1"), ("FREQ", "CH2")]) as mon:
+	       mon.run(10)
+	       t, v = mon.data()
+
+	"""
+	def __init__(self, scope, slots, depth=4096):
+		"""
+		:param scope: Scope
+		:param slots: (type, source) of measurement slots 1, 2...,
+		 eg. ("PK2PK", "CH1"), up to 4
+		:param depth: amount of readings kept
+		"""
+		if not 0 < len(slots) <= 4:
+			raise ValueError("Need 1 to 4 measurement slots")
+		self.scope = scope
+		self.slots = list(slots)
+		self.depth = depth
+		self.timestamps = np.zeros(depth)
+		self.values = np.zeros((depth, len(slots)))
+		self.count = 0
+		self._query = compound([ f"MEASUrement:MEAS{idx+1}:VALue?"
+		 for idx in range(len(slots)) ])
+
+	def __enter__(self):
+		self.configure()
+		return self
+
+	def __exit__(self, exc_type, exc_value, exc_traceback):
+		pass
+
+	def configure(self):
+		cmds = []
+		for idx, (kind, source) in enumerate(self.slots):
+			cmds.append(f"MEASUrement:MEAS{idx+1}:TYPe {kind}")
+			cmds.append(f"MEASUrement:MEAS{idx+1}:SOUrce {source}")
+		self.scope.s.write(compound(cmds))
+
+	def poll(self):
+		"""
+		Read all slots
+
+		:return: values (a copy), NaN when a measurement isn't
+		 available
+		"""
+		res = self.scope.s.ask(self._query).split(";")
+		if len(res) != len(self.slots):
+			raise RuntimeError(f"Expected {len(self.slots)} values, got {res}")
+		row = self.count % self.depth
+		self.timestamps[row] = time.time()
+		values = self.values[row]
+		for idx, x in enumerate(res):
+			v = float(x)
+			# 9.9E37 means no valid measurement
+			values[idx] = v if v < 9.9e37 else np.nan
+		self.count += 1
+		# the ring row is overwritten depth polls later
+		return values.copy()
+
+	def run(self, duration=None, period=0.0):
+		"""
+		Poll repeatedly
+
+		:param duration: how long to poll (s), forever by default
+		:param period: min. time between polls (s)
+		"""
+		t0 = time.monotonic()
+		next_poll = t0
+		while duration is None or time.monotonic() - t0 < duration:
+			delay = next_poll - time.monotonic()
+			if delay > 0:
+				time.sleep(delay)
+			next_poll += period
+			self.poll()
+
+	def data(self):
+		"""
+		:return: timestamps and values of the kept readings, oldest
+		 first
+		"""
+		n = min(self.count, self.depth)
+		start = self.count - n
+		idx = np.arange(start, start + n) % self.depth
+		return self.timestamps[idx], self.values[idx]
@@ -1,7 +1,7 @@
 import logging
 import io
 
-from ..scpi.usbtmc import SCPI
+from ..scpi.manager import session
 from .tek import Scope
 
 
@@ -9,9 +9,7 @@ logger = logging.getLogger(__name__)
 
 
 def test():
-	scpi = SCPI(0x0699, 0x03aa)
-
-	with scpi:
+	with session("usbtmc://0x0699:0x03aa") as scpi:
 		scope = Scope(scpi)
 
 		if 1:
@@ -19,6 +17,10 @@ def test():
 			curve = scope.curve()
 			logger.info("curve: %s", curve)
 
+		if 1:
+			for channel, (t, v) in scope.acquire().items():
+				logger.info("CH%d: %s, %s", channel, t, v)
+
 		if 1:
 			logger.debug("Harcopy?")
 			bmp = scope.hardcopy()
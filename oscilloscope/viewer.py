@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Live scope frame viewer, using matplotlib
+# SPDX-License-Identifier: MIT
+
+"""
+The viewer takes the latest frame from a background acquisition
+(see scope_cgr101.Acquisition) on a timer, so the redraw rate is
+capped independently of the acquisition rate, and frames acquired in
+between redraws are skipped rather than slowing down capture.
+
+Traces are decimated to a min./max. pair per horizontal pixel, which
+keeps peaks visible, and only they are redrawn (blitted) on top of a
+cached background.
+
+"""
+
+import logging
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+def decimate_minmax(x, pixels, out=None):
+	"""
+	:param x: samples
+	:param pixels: amount of bins, at most the amount of samples
+	:param out: optional output array of 2 × pixels
+	:return: min. and max. of each bin, interleaved
+	"""
+	if out is None:
+		out = np.empty(2 * pixels, dtype=x.dtype)
+	n = len(x)
+	edges = (np.arange(pixels) * n) // pixels
+	np.minimum.reduceat(x, edges, out=out[0::2])
+	np.maximum.reduceat(x, edges, out=out[1::2])
+	return out
+
+
+class Viewer:
+	def __init__(self, figure, source, max_fps=30, labels=("A", "B"), ylim=(-1, 1)):
+		"""
+		:param figure: matplotlib figure, with a canvas
+		:param source: frame source having get_latest(timeout) and
+		 a scope, eg. scope_cgr101.Acquisition
+		:param max_fps: max. redraw rate
+		:param ylim: voltage range
+		"""
+		self.figure = figure
+		self.canvas = figure.canvas
+		self.source = source
+		self.interval = 1 / max_fps
+		self.ax = figure.add_subplot(1, 1, 1)
+		self.ax.xaxis.grid(True)
+		self.ax.yaxis.grid(True)
+		self.ax.set_xlabel("Time (s)")
+		self.ax.set_ylabel("Voltage (V)")
+		self.ax.set_ylim(*ylim)
+		self.lines = [ self.ax.plot([], [], label=label, animated=True)[0] for label in labels ]
+		self.ax.legend()
+		self._background = None
+		self._sample_rate = None
+		self._pixels = None
+		self._timer = None
+		self.redraws = 0
+		self.canvas.mpl_connect("draw_event", self._on_draw)
+
+	def _on_draw(self, event):
+		# the figure was (re-)drawn, eg. resized
+		self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+		for line in self.lines:
+			self.ax.draw_artist(line)
+
+	def _layout(self, sample_rate):
+		"""
+		Recompute decimation, and redraw everything, when the sample
+		rate or the axes size changed
+		"""
+		n = 1024
+		pixels = min(max(int(self.ax.bbox.width), 1), n)
+		if sample_rate == self._sample_rate and pixels == self._pixels:
+			return
+		self._sample_rate = sample_rate
+		self._pixels = pixels
+		t = (np.arange(pixels) * n // pixels) / sample_rate
+		self._t = np.repeat(t, 2)
+		self._y = [ np.empty(2 * pixels, dtype=np.float32) for line in self.lines ]
+		for line, y in zip(self.lines, self._y):
+			line.set_data(self._t, y)
+		self.ax.set_xlim(0, n / sample_rate)
+		self.canvas.draw()
+
+	def update(self, timeout=0):
+		"""
+		Redraw traces with the latest frame, if any
+
+		:return: whether there was a frame
+		"""
+		frame = self.source.get_latest(timeout)
+		if frame is None:
+			return False
+
+		self._layout(self.source.scope.get_sample_rate())
+		for line, y, x in zip(self.lines, self._y, (frame.a, frame.b)):
+			decimate_minmax(x, self._pixels, out=y)
+			# matplotlib keeps a copy
+			line.set_ydata(y)
+
+		canvas = self.canvas
+		if self._background is None:
+			canvas.draw()
+		canvas.restore_region(self._background)
+		for line in self.lines:
+			self.ax.draw_artist(line)
+		canvas.blit(self.ax.bbox)
+		self.redraws += 1
+		return True
+
+	def start(self):
+		"""
+		Redraw periodically, from the GUI event loop
+		"""
+		self._timer = self.canvas.new_timer(interval=int(self.interval * 1000))
+		self._timer.add_callback(self.update)
+		self._timer.start()
+
+	def stop(self):
+		if self._timer is not None:
+			self._timer.stop()
+			self._timer = None
@@ -0,0 +1,48 @@
+import time
+import logging
+
+import serial
+import numpy as np
+import pytest
+
+from .viewer import decimate_minmax, Viewer
+from .scope_cgr101 import Scope, Acquisition
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_decimate_minmax():
+	x = np.arange(1024, dtype=np.float32) % 10
+	y = decimate_minmax(x, 100)
+	assert y.shape == (200,)
+	assert np.all(y[0::2] == 0)
+	assert np.all(y[1::2] == 9)
+	np.testing.assert_array_equal(decimate_minmax(x, 1024)[0::2], x)
+
+
+def test_viewer():
+	pytest.importorskip("matplotlib")
+	import matplotlib.figure
+	from matplotlib.backends.backend_agg import FigureCanvasAgg
+	from ..simulator.sim_cgr101 import CGR101
+
+	figure = matplotlib.figure.Figure(figsize=(8, 6), dpi=72)
+	FigureCanvasAgg(figure)
+
+	with CGR101() as sim:
+		with serial.Serial(port=sim.path, baudrate=230400) as ser:
+			with Scope(ser) as scope:
+				scope.set_frame_period(0.001)
+				with Acquisition(scope, depth=4) as acq:
+					viewer = Viewer(figure, acq)
+					t0 = time.monotonic()
+					while viewer.redraws < 10:
+						viewer.update(timeout=1)
+					t1 = time.monotonic()
+
+	logger.info("%d redraws in %f s, %d frames acquired, %d skipped",
+	 viewer.redraws, t1-t0, acq.acquired, acq.skipped)
+	x, y = viewer.lines[0].get_data()
+	assert len(x) == 2 * viewer._pixels
+	assert np.ptp(y) > 0
@@ -17,6 +17,9 @@ import logging
 import time
 import contextlib
 
+from ..state_cache_mixin import StateCacheMixin
+
+
 logger = logging.getLogger(__name__)
 
 
@@ -37,13 +40,15 @@ def create_serial_scpi(port):
 			yield scpi
 
 
-class PSU:
+class PSU(StateCacheMixin):
 	"""
 	"""
-	def __init__(self, scpi: "SCPI"):
+	def __init__(self, scpi: "SCPI", cache=False):
 		"""
 		:param scpi: probably a ..scpi.serial.SCPI object
+		:param cache: whether to cache setpoints (see StateCacheMixin)
 		"""
+		StateCacheMixin.__init__(self, cache)
 		self.s = scpi
 
 	def __enter__(self):
@@ -58,17 +63,29 @@ class PSU:
 	def enable(self, doit=True):
 		self.s.write("OUT {}".format("ON" if doit else "OFF"))
 
+	def _setpoint_set(self, key, fmt, value):
+		"""
+		Set a setpoint, rounded to the programming resolution, and
+		check the error queue so that a refused value isn't cached
+		"""
+		x = fmt % value
+		def command():
+			err = self.s.ask(f":{key} {x};:SYST:ERR?")
+			if not err.startswith(("+0,", "0,")):
+				raise RuntimeError(f"{key} {x} failed: {err}")
+		self._state_set(key, float(x), command)
+
 	def voltage_setpoint_get(self):
-		return float(self.s.ask(":VOLT?"))
+		return self._state_get("VOLT", lambda: float(self.s.ask(":VOLT?")))
 
 	def voltage_setpoint_set(self, value):
-		self.s.write(f":VOLT {value}")
+		self._setpoint_set("VOLT", "%.2f", value)
 
 	def current_setpoint_get(self):
-		return float(self.s.ask(f":CURR?"))
+		return self._state_get("CURR", lambda: float(self.s.ask(f":CURR?")))
 
 	def current_setpoint_set(self, value):
-		self.s.write(f":CURR {value}")
+		self._setpoint_set("CURR", "%.3f", value)
 
 	def sense_voltage(self):
 		return float(self.s.ask("MEAS:VOLT?"))
@@ -77,12 +94,88 @@ class PSU:
 		return float(self.s.ask("MEAS:CURR?"))
 
 	def sense_both(self):
-		return self.sense_voltage(), self.sense_current()
+		u, i = self.s.ask_many(("MEAS:VOLT?", "MEAS:CURR?"))
+		return float(u), float(i)
+
+	def snapshot(self):
+		"""
+		Obtain setpoints and measurements in one round trip
+
+		:return: voltage setpoint, current setpoint, voltage, current
+		"""
+		state = self._state
+		if state is not None and "VOLT" in state and "CURR" in state:
+			return (state["VOLT"], state["CURR"]) + self.sense_both()
+		try:
+			res = self.s.ask_many((":VOLT?", ":CURR?", "MEAS:VOLT?", "MEAS:CURR?"))
+		except:
+			self.resync()
+			raise
+		v_set, i_set, u, i = (float(x) for x in res)
+		if state is not None:
+			state.update(VOLT=v_set, CURR=i_set)
+		return v_set, i_set, u, i
 
 	def measure_immediate(self):
 		a, b, c = self.s.ask("MEAS?").split(",")
 		return a
 
+	def save(self, index: int):
+		self.s.write(f"*SAV {index}")
+
+	def recall(self, index: int):
+		self.resync()
+		self.s.write(f"*RCL {index}")
+
+
+class AsyncPSU:
+	"""
+	PSU, for asyncio transports
+	"""
+	def __init__(self, scpi):
+		"""
+		:param scpi: probably a ..scpi.scpi_serial_async.SCPI object
+		"""
+		self.s = scpi
+
+	async def __aenter__(self):
+		idn = await self.s.ask("*IDN?")
+		logger.info("IDN: %s", idn)
+		assert idn.startswith("HEWLETT-PACKARD,E3634A,"), f"Unknown PSU {idn}!"
+		return self
+
+	async def __aexit__(self, ext_type, exc_value, exc_traceback):
+		pass
+
+	async def enable(self, doit=True):
+		await self.s.write("OUT {}".format("ON" if doit else "OFF"))
+
+	async def voltage_setpoint_get(self):
+		return float(await self.s.ask(":VOLT?"))
+
+	async def voltage_setpoint_set(self, value):
+		await self.s.write(f":VOLT {value}")
+
+	async def current_setpoint_get(self):
+		return float(await self.s.ask(":CURR?"))
+
+	async def current_setpoint_set(self, value):
+		await self.s.write(f":CURR {value}")
+
+	async def sense_voltage(self):
+		return float(await self.s.ask("MEAS:VOLT?"))
+
+	async def sense_current(self):
+		return float(await self.s.ask("MEAS:CURR?"))
+
+	async def sense_both(self):
+		u, i = await self.s.ask_many(("MEAS:VOLT?", "MEAS:CURR?"))
+		return float(u), float(i)
+
+	async def snapshot(self):
+		res = await self.s.ask_many((":VOLT?", ":CURR?", "MEAS:VOLT?", "MEAS:CURR?"))
+		return tuple(float(x) for x in res)
+
 
 def main(argv=None):
 	import argparse
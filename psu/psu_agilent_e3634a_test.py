@@ -0,0 +1,51 @@
+import logging
+
+import pytest
+
+from ..scpi.scpi_tcp import SCPI
+from ..scpi.stats import Stats
+from ..simulator.sim_scpi import Simulator
+from ..simulator.sim_instruments import E3634A
+from .psu_agilent_e3634a import PSU
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_cache():
+	with Simulator() as sim:
+		instrument = E3634A(load=10)
+		scpi = SCPI(sim.add_tcp(instrument))
+		scpi.__enter__()
+		try:
+			with PSU(scpi, cache=True) as psu:
+				scpi.stats = Stats()
+				psu.voltage_setpoint_set(5)
+				psu.current_setpoint_set(1)
+				psu.enable()
+				for i in range(10):
+					assert psu.snapshot() == (5, 1, 5, 0.5)
+					assert psu.voltage_setpoint_get() == 5
+				summary = scpi.stats.summary()
+				assert ":VOLT?" not in summary
+				assert summary["MEAS:VOLT?;:MEAS:CURR?"]["count"] == 10
+
+				# changed behind our back
+				instrument.voltage = 4
+				assert psu.voltage_setpoint_get() == 5
+				psu.resync()
+				assert psu.voltage_setpoint_get() == 4
+
+				# cached as rounded by the instrument
+				psu.voltage_setpoint_set(5.004)
+				assert psu.voltage_setpoint_get() == 5
+				assert instrument.voltage == 5
+
+				# refused, not cached
+				scpi.stats = Stats()
+				with pytest.raises(RuntimeError):
+					psu.voltage_setpoint_set(100)
+				assert psu.voltage_setpoint_get() == 5
+				assert scpi.stats.summary()[":VOLT?"]["count"] == 1
+		finally:
+			scpi.__exit__(None, None, None)
@@ -2,18 +2,46 @@
 # -*- coding: utf-8 vi:noet
 # Userspace driver for the Korad KA3305P programmable power supply
 
+"""
+The PSU protocol has no terminators: commands are recognized by the
+firmware after a pause, and replies have a fixed length, except for
+``*IDN?``.
+
+So commands are sent knowing their reply shape:
+
+- no reply (setting commands): return immediately, but ensure that
+  the next command is sent no sooner than ``command_gap`` after it;
+- fixed-length: return as soon as the reply bytes are received;
+- variable-length: read until the line goes idle for ``idle_gap``.
+
+"""
+
 import sys, time
+import re
 import serial
 import logging
 
+from ..state_cache_mixin import StateCacheMixin
+
+
 logger = logging.getLogger(__name__)
 
-class PSU(object):
-	def __init__(self, ser):
+class PSU(StateCacheMixin):
+	def __init__(self, ser, cache=False):
+		"""
+		:param ser: serial port
+		:param cache: whether to cache setpoints (see StateCacheMixin)
+		"""
+		StateCacheMixin.__init__(self, cache)
 		self._serial = ser
+		self.command_gap = 0.05
+		self.idle_gap = 0.02
+		self.reply_timeout = 1.0
+		self.retries = 3
+		self._next_command = time.monotonic()
 
 	def __enter__(self):
-		self.cmd("*IDN?")
+		self._serial.reset_input_buffer()
 		idn = self.idn()
 		logger.info("IDN: %s", idn)
 		return self
@@ -21,41 +49,98 @@ class PSU(object):
 	def __exit__(self, exc_type, exc_value, exc_tb):
 		pass
 
-	def cmd(self, cmd, timeout=0.1, l=None):
+	# Reply length per command, 0 when there's none, None when variable
+	replies = (
+	 (re.compile(r"[IV](SET|OUT)\d\?"), 5),
+	 (re.compile(r"STATUS\?"), 1),
+	 (re.compile(r".*\?"), None),
+	 (re.compile(r".*"), 0),
+	)
+
+	def reply_length(self, cmd):
+		for regex, l in self.replies:
+			if regex.fullmatch(cmd):
+				return l
+
+	def _send(self, cmd):
+		ser = self._serial
+		delay = self._next_command - time.monotonic()
+		if delay > 0:
+			time.sleep(delay)
+		logger.debug("> %s", cmd.encode())
+		ser.write(cmd.encode())
+		ser.flush()
+
+	def _set_timeout(self, value):
+		# reconfiguring the port has a cost, avoid doing it needlessly
+		if self._serial.timeout != value:
+			self._serial.timeout = value
+
+	def _read_idle(self, timeout):
+		"""
+		Read until the line is idle
+
+		:param timeout: max. time to wait for the reply (s)
+		"""
+		ser = self._serial
+		self._set_timeout(timeout)
+		x = ser.read(1)
+		if not x:
+			return x
+		self._set_timeout(self.idle_gap)
+		while True:
+			y = ser.read(max(ser.in_waiting, 1))
+			if not y:
+				break
+			x += y
+		return x
+
+	def cmd(self, cmd, timeout=None, l=None):
 		"""
 		Send a generic command to the PSU.
 
 		:param cmd: the command to send (string)
-		:param timeout: timeout to wait for (s) if l is unspecified
-		:param l: expected length of result
+		:param timeout: max. time to wait for the reply (s), by
+		 default reply_timeout
+		:param l: expected length of result, by default known from
+		 the command
 
-		Note: when l is supplied, the command is retried until the result
-		has the right length.
+		Note: when the result has a fixed length, the command is
+		retried until the result has the right length.
 		"""
 		ser = self._serial
+		if timeout is None:
+			timeout = self.reply_timeout
 		if l is None:
-			logger.debug("> %s", cmd.encode())
-			ser.write(cmd.encode())
-			time.sleep(timeout)
-			x = ser.read(ser.in_waiting)
-			logger.debug("< %s", x.hex())
-		else:
-			while True:
-				logger.debug("> %s", cmd.encode())
-				ser.write(cmd.encode())
-				timeout = ser.timeout
-				ser.timeout = 1.0
-				x = ser.read(l)
-				logger.debug("< %s", x)
-				ser.timeout = timeout
-				if len(x) != l:
-					sys.stderr.write("Warning, no response from meter\n")
-				else:
-					break
-		return x
+			l = self.reply_length(cmd)
+
+		if l == 0:
+			self._send(cmd)
+			self._next_command = time.monotonic() + self.command_gap
+			return b""
+
+		if l is None:
+			self._send(cmd)
+			x = self._read_idle(timeout)
+			logger.debug("< %s", x)
+			return x
+
+		self._set_timeout(timeout)
+		for i in range(self.retries):
+			self._send(cmd)
+			x = ser.read(l)
+			logger.debug("< %s", x)
+			if len(x) == l:
+				return x
+			logger.warning("No response from PSU to %s (%s), attempt %d/%d",
+			 cmd, x, i+1, self.retries)
+			# let the firmware recover, and drop the partial reply
+			time.sleep(self.command_gap)
+			ser.reset_input_buffer()
+		raise TimeoutError(f"No response to {cmd!r}")
 
 	def idn(self):
-		return self.cmd("*IDN?")
+		return self.cmd("*IDN?").decode("ascii", errors="replace")
 
 	def voltage_setpoint_get(self, output=0):
 		return self.getvalue(f"VSET{output+1}?")
@@ -75,6 +160,20 @@ class PSU(object):
 	def sense_current(self, output=0):
 		return self.getvalue(f"IOUT{output+1}?")
 
+	def snapshot(self, output=0):
+		"""
+		:return: voltage setpoint, current setpoint, voltage, current
+
+		Note: the PSU doesn't support compound commands, this is
+		provided for compatibility with other PSU drivers.
+		"""
+		return (
+		 self.voltage_setpoint_get(output),
+		 self.current_setpoint_get(output),
+		 self.sense_voltage(output),
+		 self.sense_current(output),
+		)
+
 	def getvalue(self, word, l=5):
 		"""
 		Retrieve a value from the PSU
@@ -87,7 +186,10 @@ class PSU(object):
 		if not word.endswith("?"):
 			word = word + "?"
 
-		return float(self.cmd(word, l=l))
+		query = lambda: float(self.cmd(word, l=l))
+		if word[1:4] == "SET":
+			return self._state_get(word[:-1], query)
+		return query()
 
 	def setvalue(self, word, value):
 		"""
@@ -102,33 +204,48 @@ class PSU(object):
 		 "VSET1": "%5.2f",
 		 "VSET2": "%5.2f",
 		}[word]
-		self.cmd("%s:%s" % (word, fmt % value))
+		x = fmt % value
+		self._state_set(word, float(x), lambda: self.cmd("%s:%s" % (word, x)))
 
 	def set_on(self, doit=True):
-		self.cmd("OUT%d" % doit, l=None)
+		self.cmd("OUT%d" % doit)
 
 	enable = set_on
 
 	def lock(self, doit=True):
-		self.cmd("LOCK%d" % doit, l=None)
+		self.cmd("LOCK%d" % doit)
 
-	def print_status(self):
+	def save(self, index: int):
+		self.cmd("SAV%d" % index)
+
+	def recall(self, index: int):
+		self.resync()
+		self.cmd("RCL%d" % index)
+
+	def status(self):
 		"""
-		TODO
+		Read status and values of both channels in one pass
+
+		:return: dict with output state, and for each output,
+		 a dict of VSET, ISET, VOUT, IOUT, and CV (else CC) mode
 		"""
-		#out1 = self.getvalue("OUT1?")
-		iset1 = self.getvalue("ISET1?")
-		vset1 = self.getvalue("VSET1?")
-		iout1 = self.getvalue("IOUT1?")
-		vout1 = self.getvalue("VOUT1?")
-		iset2 = self.getvalue("ISET2?")
-		vset2 = self.getvalue("VSET2?")
-		iout2 = self.getvalue("IOUT2?")
-		vout2 = self.getvalue("VOUT2?")
-		print("VSET1=%.2f ISET1=%.3f VOUT1=%.2f IOUT1=%.3f" \
-		 % (vset1, iset1, vout1, iout1))
-		print("VSET2=%.2f ISET2=%.3f VOUT2=%.2f IOUT2=%.3f" \
-		 % (vset2, iset2, vout2, iout2))
+		x = self.cmd("STATUS?")[0]
+		res = dict(output=bool(x & 0x40))
+		for output in (0, 1):
+			res[output] = dict(
+			 VSET=self.voltage_setpoint_get(output),
+			 ISET=self.current_setpoint_get(output),
+			 VOUT=self.sense_voltage(output),
+			 IOUT=self.sense_current(output),
+			 CV=bool(x & (1 << output)),
+			)
+		return res
+
+	def print_status(self):
+		status = self.status()
+		for output in (0, 1):
+			print("VSET{n}=%.2f ISET{n}=%.3f VOUT{n}=%.2f IOUT{n}=%.3f".format(n=output+1) \
+			 % tuple(status[output][k] for k in ("VSET", "ISET", "VOUT", "IOUT")))
 
 def main():
 
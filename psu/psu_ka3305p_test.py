@@ -0,0 +1,82 @@
+import logging
+import os
+import threading
+import tty
+
+import serial
+
+from .psu_ka3305p import PSU
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_status():
+	master, slave = os.openpty()
+	tty.setraw(slave)
+	stop = threading.Event()
+	commands = []
+
+	def firmware():
+		"""
+		KA3305P stand-in; commands are recognized by the pause after them
+		"""
+		values = dict(VSET1=b"05.00", ISET1=b"1.000", VOUT1=b"05.00", IOUT1=b"0.500",
+		 VSET2=b"00.00", ISET2=b"0.000", VOUT2=b"00.00", IOUT2=b"0.000")
+		import select
+		rx = b""
+		while not stop.is_set():
+			r, w, x = select.select([master], [], [], 0.005)
+			if r:
+				rx += os.read(master, 64)
+				continue
+			if not rx:
+				continue
+			cmd, rx = rx.decode(), b""
+			commands.append(cmd)
+			if cmd == "*IDN?":
+				os.write(master, b"KORAD KA3305P V5.8 SN:00000000")
+			elif cmd == "STATUS?":
+				os.write(master, bytes([0x41]))
+			elif cmd[:-1] in values:
+				os.write(master, values[cmd[:-1]])
+			elif ":" in cmd:
+				k, v = cmd.split(":")
+				values[k] = v.encode()
+
+	t = threading.Thread(target=firmware)
+	t.start()
+	try:
+		with serial.Serial(os.ttyname(slave), timeout=0.1) as ser:
+			with PSU(ser) as psu:
+				psu.idle_gap = psu.command_gap = 0.02
+				assert psu.idn() == "KORAD KA3305P V5.8 SN:00000000"
+
+				# fixed-length replies don't wait for the line to go idle
+				read_idle = psu._read_idle
+				idle_reads = []
+				def counting_read_idle(timeout):
+					idle_reads.append(None)
+					return read_idle(timeout)
+				psu._read_idle = counting_read_idle
+
+				del commands[:]
+				status = psu.status()
+				assert status["output"]
+				assert status[0] == dict(VSET=5, ISET=1, VOUT=5, IOUT=0.5, CV=True)
+				assert status[1]["CV"] is False
+				# one transaction per value, no retries
+				assert commands == ["STATUS?"] + [ f"{k}{output}?"
+				 for output in (1, 2) for k in ("VSET", "ISET", "VOUT", "IOUT") ]
+				assert idle_reads == []
+				psu.voltage_setpoint_set(12.5, output=1)
+				assert psu.voltage_setpoint_get(output=1) == 12.5
+
+				# no reply, waited for as long as asked
+				assert psu.cmd("FOO?", timeout=0.05) == b""
+				assert ser.timeout == 0.05
+	finally:
+		stop.set()
+		t.join()
+		os.close(master)
+		os.close(slave)
@@ -15,6 +15,7 @@ logger = logging.getLogger(__name__)
 class SolarPanel:
 	def __init__(self, psu, ivcurve, ocv, cci):
 		"""
+		:param psu: PSU object, providing snapshot() and setpoint setters
 		:param ivcurve: callable returning i(v)
 		:param ocv: open-circuit (max) voltage
 		:param cci: closed-circuit (max) current
@@ -56,10 +57,7 @@ class SolarPanel:
 		"""
 		psu = self.psu
 
-		v_set = psu.voltage_setpoint_get()
-		i_set = psu.current_setpoint_get()
-		v_mes = psu.sense_voltage()
-		i_mes = psu.sense_current()
+		v_set, i_set, v_mes, i_mes = psu.snapshot()
 
 		logger.debug("V = %f (%f)", v_mes, v_set)
 		logger.debug("I = %f (%f)", i_mes, i_set)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Batched SCPI queries, shared by the transports
+# SPDX-License-Identifier: MIT
+
+"""
+Several queries can be sent in one go, either:
+
+- as a single compound program message (``MEAS:VOLT?;:MEAS:CURR?``),
+  which gives a single response message with ``;``-separated values,
+  and costs one round trip;
+
+- pipelined, ie. all the queries are written back-to-back before
+  reading the responses, which also works for instruments not
+  supporting compound messages, but requires that they buffer input.
+
+"""
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def compound(cmds):
+	"""
+	Join commands into a compound program message.
+
+	Subsequent commands are made absolute (prefixed with ``:``), as
+	otherwise they would be relative to the path of the previous one.
+	"""
+	out = []
+	for idx, cmd in enumerate(cmds):
+		cmd = cmd.strip()
+		if idx > 0 and not cmd.startswith((":", "*")):
+			cmd = ":" + cmd
+		out.append(cmd)
+	return ";".join(out)
+
+
+class BatchMixin:
+	"""
+	Requires ask(), write() and _read_response() from the transport.
+	"""
+	def ask_many(self, cmds, pipelined=False):
+		"""
+		Perform several queries
+
+		:param cmds: queries, each expected to give one response
+		:param pipelined: write queries separately, rather than as
+		 a compound message
+		:return: list of responses (strings), in order
+		"""
+		cmds = list(cmds)
+		if not cmds:
+			return []
+
+		if pipelined:
+			for cmd in cmds:
+				self.write(cmd)
+			return [self._read_response() for cmd in cmds]
+
+		res = self.ask(compound(cmds)).split(";")
+		if len(res) != len(cmds):
+			raise RuntimeError(f"Expected {len(cmds)} responses, got {res}")
+		return res
+
+
+class AsyncBatchMixin:
+	"""
+	Same as BatchMixin, for asyncio transports.
+
+	Requires _lock (asyncio.Lock held across a query and its response),
+	_write() and _read_response() from the transport.
+	"""
+	async def ask_many(self, cmds, pipelined=False):
+		cmds = list(cmds)
+		if not cmds:
+			return []
+
+		async with self._lock:
+			if pipelined:
+				for cmd in cmds:
+					await self._write(cmd)
+				return [await self._read_response() for cmd in cmds]
+
+			await self._write(compound(cmds))
+			res = (await self._read_response()).split(";")
+		if len(res) != len(cmds):
+			raise RuntimeError(f"Expected {len(cmds)} responses, got {res}")
+		return res
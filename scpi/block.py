@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# IEEE 488.2 definite-length arbitrary block data
+# SPDX-License-Identifier: MIT
+
+"""
+Binary responses (curves, screenshots, traces) are sent as::
+
+   #<n><length><data>
+
+where ``<n>`` is the amount of digits in ``<length>``, the size of
+``<data>`` in bytes.
+
+The transports reading into a buffer use BlockMixin.read_block(),
+which reads the data straight into a preallocated NumPy array;
+message-based transports (USBTMC) parse a complete message with
+decode().
+"""
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_header(read):
+	"""
+	:param read: callable returning exactly the requested amount of bytes
+	:return: block length
+	"""
+	x = read(2)
+	if x[:1] != b"#":
+		raise ValueError(f"Not a block: {x}")
+	n = int(x[1:2])
+	if n == 0:
+		raise ValueError("Indefinite-length blocks are not supported")
+	return int(read(n))
+
+
+def decode(data, dtype="u1"):
+	"""
+	Obtain block contents from a complete response message
+
+	:param data: response, starting with the block header
+	:param dtype: NumPy dtype of the block items (eg. ">i2")
+	:return: array viewing data (no copy)
+	"""
+	import numpy as np
+	mv = memoryview(data)
+	pos = 0
+	def read(n):
+		nonlocal pos
+		x = bytes(mv[pos:pos+n])
+		pos += n
+		return x
+	length = parse_header(read)
+	if pos + length > len(mv):
+		raise ValueError(f"Truncated block, got {len(mv)-pos} of {length} bytes")
+	dtype = np.dtype(dtype)
+	if length % dtype.itemsize:
+		raise ValueError(f"Block length {length} not a multiple of {dtype}")
+	return np.frombuffer(data, dtype=dtype, count=length // dtype.itemsize, offset=pos)
+
+
+class BlockMixin:
+	"""
+	Requires read(), readinto() and _read_response() from the transport.
+	"""
+	def read_block(self, dtype="u1", out=None):
+		"""
+		Read a definite-length block response
+
+		:param dtype: NumPy dtype of the block items (eg. ">i2")
+		:param out: optional array to read into, must be large enough
+		:return: array of block items
+		"""
+		import numpy as np
+		length = parse_header(self.read)
+		dtype = np.dtype(dtype)
+		if length % dtype.itemsize:
+			raise ValueError(f"Block length {length} not a multiple of {dtype}")
+		count = length // dtype.itemsize
+		if out is None:
+			out = np.empty(count, dtype=dtype)
+		else:
+			out = out.view(dtype).reshape(-1)[:count]
+			if out.size != count:
+				raise ValueError(f"Output array too small for {count} items")
+		self.readinto(memoryview(out.view(np.uint8)))
+		# Response message terminator
+		self._read_response()
+		return out
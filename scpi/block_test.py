@@ -0,0 +1,35 @@
+import logging
+
+import numpy as np
+import pytest
+import serial
+
+from .block import decode
+from .scpi_serial import SCPI
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_decode():
+	ref = np.arange(-1250, 1250, dtype=">i2")
+	data = b"#45000" + ref.tobytes() + b"\n"
+	arr = decode(data, ">i2")
+	assert arr.dtype == np.dtype(">i2")
+	np.testing.assert_array_equal(arr, ref)
+
+	with pytest.raises(ValueError):
+		decode(b"#13abc\n", ">i2")
+
+
+def test_read_block():
+	ref = np.arange(-500, 500, dtype=">i2")
+	ser = serial.serial_for_url("loop://", timeout=1)
+	with ser:
+		with SCPI(ser, eol=b"\n") as scpi:
+			ser.write(b"#42000" + ref.tobytes() + b"\n1\n")
+			out = np.zeros(2000, dtype=">i2")
+			arr = scpi.read_block(">i2", out=out)
+			np.testing.assert_array_equal(arr, ref)
+			assert np.shares_memory(arr, out)
+			assert scpi.readline() == b"1\n"
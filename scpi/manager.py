@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Process-wide SCPI session pool
+# SPDX-License-Identifier: MIT
+
+"""
+Sessions are keyed by instrument address, eg.:
+
+- ``tcp://192.168.1.10:3490``
+- ``udp://192.168.1.198:18190``
+- ``serial:///dev/ttyUSB0?baudrate=9600&stopbits=2&dsrdtr=1&eol=%0A``
+- ``usbtmc://0x0699:0x03aa``
+
+and shared by everything in the process asking for the same address,
+so that connection and identification costs are paid once:
+
+.. code:: python
+
+   from .scpi.manager import session
+
+   with session("usbtmc://0x0699:0x03aa") as scpi:
+       with Scope(scpi) as scope:
+           ...
+
+A session is used like a transport (ask/write/...), holding the lock
+for the duration of the with block (and of each call otherwise).
+When a call fails because the link dropped, the transport is closed,
+and re-opened on the next call; the call itself is retried once when
+it's safe to repeat, that is when it's only made of queries, or when
+the caller says so (eg. ``write(":VOLT 5", retry=True)``), but not eg.
+for ``*TRG`` or ``INIT``.
+The cached identification is dropped on reconnection, as the
+instrument may have been replaced.
+"""
+
+import atexit
+import contextlib
+import logging
+import threading
+import urllib.parse
+
+
+logger = logging.getLogger(__name__)
+
+
+link_errors = (ConnectionError,)
+try:
+	import serial
+	link_errors += (serial.SerialException,)
+except ImportError:
+	pass
+
+
+def is_query(cmd):
+	"""
+	:return: whether a program message is only made of queries
+	"""
+	return all(x.strip().split(" ", 1)[0].endswith("?")
+	 for x in cmd.split(";") if x.strip())
+
+
+def _open_tcp(stack, url):
+	from .scpi_tcp import SCPI
+	scpi = SCPI((url.hostname, url.port))
+	stack.enter_context(scpi)
+	return scpi
+
+
+def _open_udp(stack, url):
+	from .scpi_udp import SCPI
+	return stack.enter_context(SCPI((url.hostname, url.port)))
+
+
+def _open_serial(stack, url):
+	import serial
+	from .scpi_serial import SCPI
+	kw = dict(urllib.parse.parse_qsl(url.query))
+	eol = kw.pop("eol", "\r\n").encode()
+	types = {
+	 "baudrate": int,
+	 "bytesize": int,
+	 "stopbits": float,
+	 "timeout": float,
+	 "xonxoff": lambda x: bool(int(x)),
+	 "rtscts": lambda x: bool(int(x)),
+	 "dsrdtr": lambda x: bool(int(x)),
+	}
+	kw = { k: types.get(k, str)(v) for k, v in kw.items() }
+	ser = stack.enter_context(serial.Serial(port=url.path, **kw))
+	return stack.enter_context(SCPI(ser, eol=eol))
+
+
+def _open_usbtmc(stack, url):
+	from .usbtmc import SCPI
+	vid, pid = url.netloc.split(":")
+	scpi = SCPI(int(vid, 0), int(pid, 0))
+	stack.enter_context(scpi)
+	return scpi
+
+
+openers = {
+ "tcp": _open_tcp,
+ "udp": _open_udp,
+ "serial": _open_serial,
+ "usbtmc": _open_usbtmc,
+}
+
+
+class Session:
+	"""
+	Shared, lock-protected transport
+	"""
+	def __init__(self, address):
+		self.address = address
+		self.lock = threading.RLock()
+		self._stack = None
+		self._scpi = None
+		self._idn = None
+
+	def __str__(self):
+		return f"(Session {self.address})"
+
+	def __enter__(self):
+		self.lock.acquire()
+		try:
+			self.open()
+		except:
+			self.lock.release()
+			raise
+		return self
+
+	def __exit__(self, exc_type, exc_value, exc_traceback):
+		self.lock.release()
+
+	def open(self):
+		with self.lock:
+			if self._scpi is not None:
+				return
+			url = urllib.parse.urlsplit(self.address)
+			opener = openers[url.scheme]
+			logger.info("%s connect", self)
+			with contextlib.ExitStack() as stack:
+				self._scpi = opener(stack, url)
+				self._stack = stack.pop_all()
+
+	def close(self):
+		with self.lock:
+			if self._stack is None:
+				return
+			logger.info("%s disconnect", self)
+			stack, self._stack, self._scpi = self._stack, None, None
+			self._idn = None
+			try:
+				stack.close()
+			except Exception as e:
+				logger.warning("%s error on close: %s", self, e)
+
+	def _call(self, retry, name, *args, **kw):
+		"""
+		:param retry: whether the call can be repeated after a link
+		 error
+		"""
+		with self.lock:
+			self.open()
+			try:
+				return getattr(self._scpi, name)(*args, **kw)
+			except link_errors as e:
+				self.close()
+				if not retry:
+					logger.warning("%s link error (%s), not retrying", self, e)
+					raise
+				logger.warning("%s link error (%s), reconnecting", self, e)
+				self.open()
+				return getattr(self._scpi, name)(*args, **kw)
+
+	def idn(self):
+		"""
+		:return: identification, queried once per connection
+		"""
+		with self.lock:
+			if self._idn is None:
+				self._idn = self._call(True, "ask", "*IDN?")
+			return self._idn
+
+	def ask(self, cmd, *, retry=None):
+		"""
+		:param retry: whether to retry on link error, by default if
+		 cmd is only made of queries
+		"""
+		if cmd.strip().upper() == "*IDN?":
+			return self.idn()
+		if retry is None:
+			retry = is_query(cmd)
+		return self._call(retry, "ask", cmd)
+
+	def write(self, cmd, *, retry=False):
+		"""
+		:param retry: whether cmd can safely be sent again on link error
+		"""
+		return self._call(retry, "write", cmd)
+
+	def ask_many(self, cmds, *, retry=None, **kw):
+		if retry is None:
+			retry = all(is_query(x) for x in cmds)
+		return self._call(retry, "ask_many", cmds, **kw)
+
+	def __getattr__(self, name):
+		# read(), read_until(), read_block(), ... are only meaningful
+		# after a write in the same with block, so aren't retried.
+		if name.startswith("_"):
+			raise AttributeError(name)
+		self.open()
+		return getattr(self._scpi, name)
+
+
+class ResourceManager:
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._sessions = dict()
+
+	def session(self, address):
+		"""
+		:return: session for address, created if needed
+		"""
+		with self._lock:
+			try:
+				return self._sessions[address]
+			except KeyError:
+				s = self._sessions[address] = Session(address)
+				return s
+
+	def close(self):
+		with self._lock:
+			sessions, self._sessions = self._sessions, dict()
+		for s in sessions.values():
+			s.close()
+
+
+manager = ResourceManager()
+session = manager.session
+atexit.register(manager.close)
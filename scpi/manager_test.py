@@ -0,0 +1,109 @@
+import logging
+import socket
+import threading
+
+import pytest
+
+from .manager import ResourceManager, openers
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_session():
+	srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	srv.bind(("127.0.0.1", 0))
+	srv.listen(1)
+	host, port = srv.getsockname()
+
+	rx = []
+
+	def serve():
+		"""
+		Answer one query per connection, then drop the link
+		"""
+		for idx_conn in range(2):
+			conn, addr = srv.accept()
+			with conn, conn.makefile("rb") as f:
+				line = f.readline()
+				rx.append(line)
+				if line == b"*IDN?\r\n":
+					conn.sendall(b"ACME,SIM,0,1.0\n")
+				elif line == b"MEAS?\r\n":
+					conn.sendall(f"{idx_conn}\n".encode())
+
+	t = threading.Thread(target=serve)
+	t.start()
+
+	manager = ResourceManager()
+	address = f"tcp://{host}:{port}"
+	try:
+		s = manager.session(address)
+		assert manager.session(address) is s
+		with s as scpi:
+			assert scpi.ask("*IDN?") == "ACME,SIM,0,1.0"
+			assert scpi.ask("*IDN?") == "ACME,SIM,0,1.0"
+			assert scpi.ask("MEAS?") == "1"
+	finally:
+		manager.close()
+		t.join()
+		srv.close()
+
+	assert rx == [b"*IDN?\r\n", b"MEAS?\r\n"]
+
+
+def test_reconnect(monkeypatch):
+	links = []
+	failures = [0]
+
+	class Link:
+		"""
+		Transport whose next calls fail while failures[0] > 0
+		"""
+		def __init__(self):
+			self.rx = []
+
+		def _rx(self, cmd):
+			self.rx.append(cmd)
+			if failures[0]:
+				failures[0] -= 1
+				raise ConnectionError("broken")
+
+		def ask(self, cmd):
+			self._rx(cmd)
+			if cmd == "*IDN?":
+				return f"ACME,SIM,{len(links)-1},1.0"
+			return "1"
+
+		def write(self, cmd):
+			self._rx(cmd)
+
+	def open_link(stack, url):
+		links.append(Link())
+		return links[-1]
+
+	monkeypatch.setitem(openers, "link", open_link)
+	manager = ResourceManager()
+	with manager.session("link://x") as scpi:
+		assert scpi.ask("*IDN?") == "ACME,SIM,0,1.0"
+
+		# not repeated
+		failures[0] = 2
+		with pytest.raises(ConnectionError):
+			scpi.write("*TRG")
+		with pytest.raises(ConnectionError):
+			scpi.ask("INIT;FETCH?")
+		assert links[0].rx == ["*IDN?", "*TRG"]
+		assert links[1].rx == ["INIT;FETCH?"]
+
+		# identification is queried again after reconnection
+		assert scpi.ask("*IDN?") == "ACME,SIM,2,1.0"
+
+		# queries, and writes marked as safe, are repeated
+		failures[0] = 1
+		assert scpi.ask("MEAS?") == "1"
+		failures[0] = 1
+		scpi.write(":VOLT 5", retry=True)
+		assert links[-1].rx == [":VOLT 5"]
+		assert len(links) == 5
+	manager.close()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Record/replay of transport traffic
+# SPDX-License-Identifier: MIT
+
+"""
+Recorder wraps a transport, either an SCPI object or a raw
+serial.Serial (as used by the CGR-101 scope, KA3305P PSU or Fluke 187
+drivers), and logs every call (with arguments, result and timing) and
+attribute access to a file.
+
+Player reads such a file and behaves like the recorded transport,
+returning the recorded results, either as fast as possible or with the
+original timing; calls are checked against the recording, so that
+driver changes that alter the traffic are detected.
+
+This allows benchmarking and regression-testing drivers offline:
+
+.. code:: python
+
+   with serial.Serial(...) as ser, record(ser, "cgr101.rec.gz") as ser:
+       with Scope(ser) as scope:
+           ...
+
+   with replay("cgr101.rec.gz") as ser:
+       with Scope(ser) as scope:
+           ...
+
+The file is a gzip-compressed stream of pickled records, so only replay
+trusted files.
+"""
+
+import contextlib
+import gzip
+import logging
+import pickle
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class Recorder:
+	def __init__(self, target, fo):
+		"""
+		:param target: transport to wrap
+		:param fo: binary file object to write records to
+		"""
+		object.__setattr__(self, "_target", target)
+		object.__setattr__(self, "_pickler", pickle.Pickler(fo, protocol=pickle.HIGHEST_PROTOCOL))
+		object.__setattr__(self, "_t0", time.monotonic())
+
+	def _record(self, kind, name, args, result, t_start):
+		t = time.monotonic() - self._t0
+		self._pickler.dump((t_start - self._t0, t, kind, name, args, result))
+
+	def _call(self, name, *args, **kw):
+		t_start = time.monotonic()
+		try:
+			res = getattr(self._target, name)(*args, **kw)
+		except Exception as e:
+			self._record("raise", name, (args, kw), e, t_start)
+			raise
+		self._record("call", name, (args, kw), res, t_start)
+		return res
+
+	def readinto(self, b):
+		# the result is what was put in b
+		t_start = time.monotonic()
+		n = self._target.readinto(b)
+		data = bytes(memoryview(b).cast("B")[:n])
+		self._record("call", "readinto", None, data, t_start)
+		return n
+
+	def __getattr__(self, name):
+		value = getattr(self._target, name)
+		if callable(value):
+			def call(*args, **kw):
+				return self._call(name, *args, **kw)
+			return call
+		self._record("get", name, None, value, time.monotonic())
+		return value
+
+	def __setattr__(self, name, value):
+		self._record("set", name, value, None, time.monotonic())
+		setattr(self._target, name, value)
+
+	def __enter__(self):
+		self._call("__enter__")
+		return self
+
+	def __exit__(self, exc_type, exc_value, exc_traceback):
+		t_start = time.monotonic()
+		res = self._target.__exit__(exc_type, exc_value, exc_traceback)
+		self._record("call", "__exit__", None, res, t_start)
+		return res
+
+
+class Player:
+	def __init__(self, fo, timing=False):
+		"""
+		:param fo: binary file object to read records from
+		:param timing: whether to reproduce the recorded timing
+		"""
+		object.__setattr__(self, "_unpickler", pickle.Unpickler(fo))
+		object.__setattr__(self, "_timing", timing)
+		object.__setattr__(self, "_t0", time.monotonic())
+		object.__setattr__(self, "_peeked", None)
+
+	def _peek(self):
+		if self._peeked is None:
+			try:
+				object.__setattr__(self, "_peeked", self._unpickler.load())
+			except EOFError:
+				return None
+		return self._peeked
+
+	def _next(self, kind, name, args):
+		rec = self._peek()
+		if rec is None:
+			raise RuntimeError(f"Replay: end of recording, at {kind} {name} {args}")
+		object.__setattr__(self, "_peeked", None)
+		t_start, t, rkind, rname, rargs, result = rec
+
+		if rname != name or rkind != kind and not (kind, rkind) == ("call", "raise"):
+			raise RuntimeError(f"Replay: expected {rkind} {rname}, got {kind} {name}")
+
+		if _normalize(rargs) != _normalize(args):
+			raise RuntimeError(f"Replay: {name} expected {rargs}, got {args}")
+
+		if self._timing:
+			delay = self._t0 + t - time.monotonic()
+			if delay > 0:
+				time.sleep(delay)
+
+		if rkind == "raise":
+			raise result
+		return result
+
+	def __getattr__(self, name):
+		if name.startswith("__"):
+			raise AttributeError(name)
+		rec = self._peek()
+		if rec is not None and rec[2] == "get" and rec[3] == name:
+			return self._next("get", name, None)
+		def call(*args, **kw):
+			return self._next("call", name, (args, kw))
+		return call
+
+	def __setattr__(self, name, value):
+		self._next("set", name, value)
+
+	def readinto(self, b):
+		data = self._next("call", "readinto", None)
+		memoryview(b).cast("B")[:len(data)] = data
+		return len(data)
+
+	def __enter__(self):
+		self._next("call", "__enter__", ((), {}))
+		return self
+
+	def __exit__(self, exc_type, exc_value, exc_traceback):
+		return self._next("call", "__exit__", None)
+
+
+def _normalize(args):
+	"""
+	Make arguments comparable (eg. a bytearray or memoryview is written
+	as bytes)
+	"""
+	if isinstance(args, (bytearray, memoryview)):
+		return bytes(args)
+	if isinstance(args, (tuple, list)):
+		return tuple(_normalize(x) for x in args)
+	if isinstance(args, dict):
+		return { k: _normalize(v) for k, v in args.items() }
+	return args
+
+
+@contextlib.contextmanager
+def record(target, path):
+	with gzip.open(path, "wb") as fo:
+		yield Recorder(target, fo)
+
+
+@contextlib.contextmanager
+def replay(path, timing=False):
+	with gzip.open(path, "rb") as fo:
+		yield Player(fo, timing=timing)
@@ -0,0 +1,36 @@
+import logging
+
+import numpy as np
+import serial
+
+from .replay import record, replay
+from .scpi_serial import SCPI
+
+
+logger = logging.getLogger(__name__)
+
+
+def session(scpi):
+	"""
+	Some driver-like traffic; loopback echoes queries
+	"""
+	res = [scpi.ask("*IDN?")]
+	res += scpi.ask_many(["MEAS:VOLT?", "MEAS:CURR?"])
+	ref = np.arange(100, dtype=">i2")
+	scpi.ser.write(b"#3200" + ref.tobytes() + b"\n")
+	res.append(scpi.read_block(">i2").tolist())
+	return res
+
+
+def test_record_replay(tmp_path):
+	path = tmp_path / "loop.rec.gz"
+
+	ser = serial.serial_for_url("loop://", timeout=1)
+	with ser, record(ser, path) as rec:
+		scpi = SCPI(rec, eol=b"\n")
+		ref = session(scpi)
+
+	for timing in (False, True):
+		with replay(path, timing=timing) as ser:
+			scpi = SCPI(ser, eol=b"\n")
+			assert session(scpi) == ref
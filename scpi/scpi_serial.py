@@ -5,15 +5,28 @@
 import logging
 import serial
 
+from .batch import BatchMixin
+from .block import BlockMixin
+
+
 logger = logging.getLogger(__name__)
 
 
-class SCPI(object):
+class SCPI(BatchMixin, BlockMixin):
 	"""
+	SCPI over a serial port.
+
+	Received data is accumulated in an internal buffer, which is fed
+	with whatever the port has pending (at least one byte), so that
+	long responses don't cost one read call per byte.
+
+	Set stats to a .stats.Stats object to instrument.
 	"""
 	def __init__(self, ser, eol=b"\r\n"):
 		self.ser = ser
 		self.eol = eol
+		self.stats = None
+		self._rx = bytearray()
 		if not self.ser.is_open:
 			raise RuntimeError('Communication initialization failed!')
 
@@ -23,23 +36,96 @@ class SCPI(object):
 	def __exit__(self, exc_type, exc_value, exc_traceback):
 		pass
 
-	def readline(self):
-		line = b""
+	def _fill(self):
+		"""
+		Append pending data to the receive buffer, blocking (up to the
+		port timeout) for at least one byte.
+
+		:return: amount of bytes received
+		"""
+		x = self.ser.read(max(self.ser.in_waiting, 1))
+		self._rx += x
+		if self.stats is not None:
+			self.stats.rx(len(x))
+			if not x:
+				self.stats.timeout()
+		return len(x)
+
+	def read(self, n):
+		"""
+		Read exactly n bytes
+		"""
+		while len(self._rx) < n:
+			self._fill()
+		res = bytes(self._rx[:n])
+		del self._rx[:n]
+		return res
+
+	def readinto(self, b):
+		"""
+		Fill b completely, data already buffered first
+		"""
+		mv = memoryview(b).cast("B")
+		n = min(len(self._rx), len(mv))
+		mv[:n] = self._rx[:n]
+		del self._rx[:n]
+		while n < len(mv):
+			r = self.ser.readinto(mv[n:])
+			if self.stats is not None:
+				self.stats.rx(r)
+				if not r:
+					self.stats.timeout()
+			n += r
+		return n
+
+	def read_until(self, x):
+		"""
+		Read up to and including terminator x
+		"""
+		start = 0
 		while True:
-			a = self.ser.read(1)
-			line += a
-			if line.endswith(self.eol):
+			idx = self._rx.find(x, start)
+			if idx >= 0:
 				break
-		return line
+			# terminator may straddle what we have and what comes next
+			start = max(0, len(self._rx) - len(x) + 1)
+			self._fill()
+		end = idx + len(x)
+		res = bytes(self._rx[:end])
+		del self._rx[:end]
+		return res
 
-	def write(self, cmd):
-		logger.debug("> %s", cmd)
-		return self.ser.write("{}".format(cmd).encode('ascii') + self.eol)
+	def readline(self):
+		return self.read_until(self.eol)
 
-	def ask(self, cmd):
-		logger.debug("> %s", cmd)
-		self.ser.write("{}".format(cmd).encode('ascii') + self.eol)
+	def _read_response(self):
 		res = self.readline().rstrip().decode('ascii')
 		logger.debug("< %s", res)
 		return res
 
+	def _send(self, cmd):
+		logger.debug("> %s", cmd)
+		data = "{}".format(cmd).encode('ascii') + self.eol
+		if self.stats is not None:
+			self.stats.tx(len(data))
+		return self.ser.write(data)
+
+	def write(self, cmd):
+		stats = self.stats
+		if stats is None:
+			return self._send(cmd)
+		t0 = stats.clock()
+		res = self._send(cmd)
+		stats.command(cmd, t0, "write")
+		return res
+
+	def ask(self, cmd):
+		stats = self.stats
+		if stats is None:
+			self._send(cmd)
+			return self._read_response()
+		t0 = stats.clock()
+		self._send(cmd)
+		res = self._read_response()
+		stats.command(cmd, t0)
+		return res
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# asyncio SCPI interface for serial port
+# SPDX-License-Identifier: MIT
+
+"""
+Same surface as scpi_serial.SCPI, with coroutines.
+
+The port is watched by the event loop (add_reader() / add_writer() on
+its file descriptor, so POSIX only) and read and written without
+blocking, so no thread is needed per instrument:
+
+.. code:: python
+
+   with serial.Serial(port="/dev/ttyUSB0", baudrate=57600) as ser:
+       async with SCPI(ser, eol=b"\n") as scpi:
+           idn = await scpi.ask("*IDN?")
+
+"""
+
+import asyncio
+import logging
+
+from .batch import AsyncBatchMixin
+
+
+logger = logging.getLogger(__name__)
+
+
+class SCPI(AsyncBatchMixin):
+	def __init__(self, ser, eol=b"\r\n", timeout=None):
+		"""
+		:param ser: open serial.Serial object
+		:param timeout: max. time to wait for data (s), or None
+		"""
+		self.ser = ser
+		self.eol = eol
+		self.timeout = timeout
+		self._rx = bytearray()
+		# concurrent tasks mustn't interleave queries and responses
+		self._lock = asyncio.Lock()
+		if not self.ser.is_open:
+			raise RuntimeError('Communication initialization failed!')
+
+	async def __aenter__(self):
+		self._ser_timeout = self.ser.timeout
+		self._ser_write_timeout = self.ser.write_timeout
+		self.ser.timeout = 0
+		self.ser.write_timeout = 0
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, exc_traceback):
+		self.ser.timeout = self._ser_timeout
+		self.ser.write_timeout = self._ser_write_timeout
+
+	async def _wait(self, add, remove):
+		loop = asyncio.get_running_loop()
+		fut = loop.create_future()
+		fd = self.ser.fileno()
+		add(fd, lambda: fut.done() or fut.set_result(None))
+		try:
+			await asyncio.wait_for(fut, self.timeout)
+		finally:
+			remove(fd)
+
+	async def _wait_readable(self):
+		loop = asyncio.get_running_loop()
+		await self._wait(loop.add_reader, loop.remove_reader)
+
+	async def _wait_writable(self):
+		loop = asyncio.get_running_loop()
+		await self._wait(loop.add_writer, loop.remove_writer)
+
+	async def _fill(self):
+		x = self.ser.read(self.ser.in_waiting)
+		if not x:
+			await self._wait_readable()
+			x = self.ser.read(self.ser.in_waiting)
+		self._rx += x
+
+	async def read(self, n):
+		while len(self._rx) < n:
+			await self._fill()
+		res = bytes(self._rx[:n])
+		del self._rx[:n]
+		return res
+
+	async def read_until(self, x):
+		start = 0
+		while True:
+			idx = self._rx.find(x, start)
+			if idx >= 0:
+				break
+			start = max(0, len(self._rx) - len(x) + 1)
+			await self._fill()
+		end = idx + len(x)
+		res = bytes(self._rx[:end])
+		del self._rx[:end]
+		return res
+
+	async def readline(self):
+		return await self.read_until(self.eol)
+
+	async def _read_response(self):
+		res = (await self.readline()).rstrip().decode('ascii')
+		logger.debug("< %s", res)
+		return res
+
+	async def _write(self, cmd):
+		logger.debug("> %s", cmd)
+		data = memoryview("{}".format(cmd).encode('ascii') + self.eol)
+		while data:
+			# non-blocking writes only make progress once writable
+			await self._wait_writable()
+			n = self.ser.write(data)
+			data = data[n:]
+
+	async def write(self, cmd):
+		async with self._lock:
+			await self._write(cmd)
+
+	async def ask(self, cmd):
+		async with self._lock:
+			await self._write(cmd)
+			return await self._read_response()
@@ -0,0 +1,41 @@
+import asyncio
+import logging
+import os
+
+import serial
+
+from .scpi_serial_async import SCPI
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_pty():
+	master, slave = os.openpty()
+	ser = serial.Serial(os.ttyname(slave), timeout=1)
+
+	async def instrument():
+		rx = bytearray()
+		while not rx.endswith(b"*IDN?\n"):
+			await asyncio.sleep(0.01)
+			try:
+				rx += os.read(master, 1024)
+			except BlockingIOError:
+				pass
+		for chunk in (b"ACME,", b"1234\n", b"1;2\n"):
+			os.write(master, chunk)
+			await asyncio.sleep(0.01)
+
+	async def main():
+		async with SCPI(ser, eol=b"\n", timeout=1) as scpi:
+			task = asyncio.create_task(instrument())
+			assert await scpi.ask("*IDN?") == "ACME,1234"
+			assert await scpi.read_until(b";") == b"1;"
+			assert await scpi.read(2) == b"2\n"
+			await task
+
+	os.set_blocking(master, False)
+	with ser:
+		asyncio.run(main())
+	os.close(master)
+	os.close(slave)
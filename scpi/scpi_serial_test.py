@@ -0,0 +1,62 @@
+import logging
+
+import serial
+
+from .scpi_serial import SCPI
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_loopback():
+	ser = serial.serial_for_url("loop://", timeout=1)
+	with ser:
+		with SCPI(ser, eol=b"\n") as scpi:
+			values = ",".join("{:+.6E}".format(i) for i in range(200))
+			res = scpi.ask(values)
+			assert res == values
+
+			ser.write(b"abc\nde\nfghi")
+			assert scpi.readline() == b"abc\n"
+			assert scpi.read(2) == b"de"
+			assert scpi.readline() == b"\n"
+			assert scpi.read(4) == b"fghi"
+
+
+def test_ask_many():
+	ser = serial.serial_for_url("loop://", timeout=1)
+	with ser:
+		with SCPI(ser, eol=b"\n") as scpi:
+			# loopback echoes queries, which is enough to check framing
+			cmds = ["MEAS:VOLT?", "MEAS:CURR?", "*OPC?"]
+			assert scpi.ask_many(cmds) == ["MEAS:VOLT?", ":MEAS:CURR?", "*OPC?"]
+			assert scpi.ask_many(cmds, pipelined=True) == cmds
+			assert scpi.ask_many([]) == []
+
+
+def test_stats():
+	import io
+	import json
+	from .stats import Stats
+
+	ser = serial.serial_for_url("loop://", timeout=0.01)
+	with ser:
+		with SCPI(ser, eol=b"\n") as scpi:
+			scpi.stats = Stats(trace=True)
+			for i in range(10):
+				scpi.ask(f":VOLT {i}")
+			scpi.write("*RST")
+			scpi.readline()
+			assert scpi._fill() == 0
+			assert scpi.stats.timeouts == 1
+
+			summary = scpi.stats.summary()
+			assert summary[":VOLT"]["count"] == 10
+			assert summary["*RST"]["count"] == 1
+			assert summary[":VOLT"]["p99"] >= summary[":VOLT"]["min"]
+			assert scpi.stats.bytes_tx == 10 * len(":VOLT 0\n") + len("*RST\n")
+
+			fo = io.StringIO()
+			scpi.stats.dump_chrome_trace(fo)
+			events = json.loads(fo.getvalue())["traceEvents"]
+			assert len([x for x in events if x["ph"] == "X"]) == 11
@@ -9,14 +9,32 @@ import logging
 import time
 import contextlib
 
+from .batch import BatchMixin
+from .block import BlockMixin
+
+
 logger = logging.getLogger(__name__)
 
-class SCPI(object):
-	def __init__(self, endpoint, eol_tx=b"\r\n", eol_rx=b"\n"):
+class SCPI(BatchMixin, BlockMixin):
+	"""
+	SCPI over a TCP socket.
+
+	Received data goes into a preallocated buffer using recv_into(),
+	and read() / read_until() consume from it; whatever was received
+	past a response is kept for the next call.
+
+	Set stats to a .stats.Stats object to instrument.
+	"""
+	def __init__(self, endpoint, eol_tx=b"\r\n", eol_rx=b"\n", bufsize=65536):
 		self._endpoint = endpoint
 		self._eol_tx = eol_tx
 		self._eol_rx = eol_rx
 		self._connect_attempts = 3
+		self.stats = None
+		self._rxbuf = bytearray(bufsize)
+		self._rxview = memoryview(self._rxbuf)
+		self._rx_start = 0
+		self._rx_end = 0
 
 	def __str__(self):
 		return "(SCPI_TCP)"
@@ -24,12 +42,15 @@ class SCPI(object):
 	def __enter__(self):
 		logger.debug("%s enter", self)
 		self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self._rx_start = self._rx_end = 0
 		self.sock.__enter__()
 		for i in range(self._connect_attempts):
 			try:
 				self.sock.connect(self._endpoint)
 				break
 			except ConnectionRefusedError:
+				if self.stats is not None:
+					self.stats.retry()
 				time.sleep(1)
 				if i == self._connect_attempts-1:
 					raise
@@ -39,24 +60,105 @@ class SCPI(object):
 		self.sock.close()
 		self.sock.__exit__(exc_type, exc_value, exc_traceback)
 
-	def write(self, cmd):
+	def _send(self, cmd):
 		logger.debug("> %s", cmd)
-		return self.sock.sendall(cmd.encode() + self._eol_tx)
+		data = cmd.encode() + self._eol_tx
+		if self.stats is not None:
+			self.stats.tx(len(data))
+		return self.sock.sendall(data)
+
+	def write(self, cmd):
+		stats = self.stats
+		if stats is None:
+			return self._send(cmd)
+		t0 = stats.clock()
+		res = self._send(cmd)
+		stats.command(cmd, t0, "write")
+		return res
+
+	def _recv_into(self, b):
+		try:
+			n = self.sock.recv_into(b)
+		except socket.timeout:
+			if self.stats is not None:
+				self.stats.timeout()
+			raise
+		if n == 0:
+			raise ConnectionError("Connection closed by peer")
+		if self.stats is not None:
+			self.stats.rx(n)
+		return n
+
+	def _fill(self):
+		"""
+		Receive more data at the end of the buffer, making room first
+		by moving pending data to the front, or growing the buffer.
+		"""
+		start, end = self._rx_start, self._rx_end
+		if end == len(self._rxbuf):
+			pending = end - start
+			if start == 0:
+				self._rxview.release()
+				self._rxbuf.extend(bytes(len(self._rxbuf)))
+				self._rxview = memoryview(self._rxbuf)
+			else:
+				self._rxview[:pending] = self._rxview[start:end]
+			self._rx_start, self._rx_end = 0, pending
+
+		self._rx_end += self._recv_into(self._rxview[self._rx_end:])
+
+	def _consume_n(self, n):
+		self._rx_start += n
+		if self._rx_start == self._rx_end:
+			self._rx_start = self._rx_end = 0
+
+	def _consume(self, n):
+		start = self._rx_start
+		res = bytes(self._rxview[start:start+n])
+		self._consume_n(n)
+		return res
 
 	def read(self, n):
-		a = bytearray()
-		while len(a) != n:
-			a += self.sock.recv(1)
-		return bytes(a)
+		while self._rx_end - self._rx_start < n:
+			self._fill()
+		return self._consume(n)
+
+	def readinto(self, b):
+		"""
+		Fill b completely, data already buffered first, then
+		receiving directly into b
+		"""
+		mv = memoryview(b).cast("B")
+		n = min(self._rx_end - self._rx_start, len(mv))
+		mv[:n] = self._rxview[self._rx_start:self._rx_start+n]
+		self._consume_n(n)
+		while n < len(mv):
+			n += self._recv_into(mv[n:])
+		return n
 
 	def read_until(self, x):
-		a = bytearray()
-		while not a.endswith(x):
-			a += self.sock.recv(1)
-		return bytes(a)
+		scanned = 0
+		while True:
+			idx = self._rxbuf.find(x, self._rx_start + scanned, self._rx_end)
+			if idx >= 0:
+				break
+			# terminator may straddle what we have and what comes next
+			scanned = max(0, self._rx_end - self._rx_start - len(x) + 1)
+			self._fill()
+		return self._consume(idx + len(x) - self._rx_start)
 
-	def ask(self, cmd):
-		self.write(cmd)
+	def _read_response(self):
 		res = self.read_until(self._eol_rx).rstrip().decode('ascii')
 		logger.debug("< %s", res)
 		return res
+
+	def ask(self, cmd):
+		stats = self.stats
+		if stats is None:
+			self._send(cmd)
+			return self._read_response()
+		t0 = stats.clock()
+		self._send(cmd)
+		res = self._read_response()
+		stats.command(cmd, t0)
+		return res
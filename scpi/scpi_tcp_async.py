@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# asyncio SCPI interface for TCP
+# SPDX-License-Identifier: MIT
+
+"""
+Same surface as scpi_tcp.SCPI, with coroutines, so that a single event
+loop can talk to many instruments:
+
+.. code:: python
+
+   async with SCPI(("192.168.1.10", 3490)) as scpi:
+       idn = await scpi.ask("*IDN?")
+
+"""
+
+import asyncio
+import logging
+
+from .batch import AsyncBatchMixin
+
+
+logger = logging.getLogger(__name__)
+
+
+class SCPI(AsyncBatchMixin):
+	def __init__(self, endpoint, eol_tx=b"\r\n", eol_rx=b"\n", limit=2**20):
+		"""
+		:param endpoint: (host, port)
+		:param limit: max. size of a response
+		"""
+		self._endpoint = endpoint
+		self._eol_tx = eol_tx
+		self._eol_rx = eol_rx
+		self._limit = limit
+		self._connect_attempts = 3
+		# concurrent tasks mustn't interleave queries and responses
+		self._lock = asyncio.Lock()
+
+	def __str__(self):
+		return "(SCPI_TCP_async)"
+
+	async def __aenter__(self):
+		logger.debug("%s enter", self)
+		host, port = self._endpoint
+		for i in range(self._connect_attempts):
+			try:
+				self._reader, self._writer = await asyncio.open_connection(
+				 host, port, limit=self._limit)
+				break
+			except ConnectionRefusedError:
+				if i == self._connect_attempts-1:
+					raise
+				await asyncio.sleep(1)
+		return self
+
+	async def __aexit__(self, exc_type, exc_value, exc_traceback):
+		logger.debug("%s exit", self)
+		self._writer.close()
+		await self._writer.wait_closed()
+
+	async def _write(self, cmd):
+		logger.debug("> %s", cmd)
+		self._writer.write(cmd.encode() + self._eol_tx)
+		await self._writer.drain()
+
+	async def write(self, cmd):
+		async with self._lock:
+			await self._write(cmd)
+
+	async def read(self, n):
+		return await self._reader.readexactly(n)
+
+	async def read_until(self, x):
+		return await self._reader.readuntil(x)
+
+	async def _read_response(self):
+		res = (await self.read_until(self._eol_rx)).rstrip().decode('ascii')
+		logger.debug("< %s", res)
+		return res
+
+	async def ask(self, cmd):
+		async with self._lock:
+			await self._write(cmd)
+			return await self._read_response()
@@ -0,0 +1,41 @@
+import logging
+import socket
+import threading
+
+from .scpi_tcp import SCPI
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_buffer():
+	srv = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	srv.bind(("127.0.0.1", 0))
+	srv.listen(1)
+
+	values = ",".join("{:+.8E}".format(i) for i in range(4000))
+
+	def serve():
+		conn, addr = srv.accept()
+		with conn:
+			f = conn.makefile("rb")
+			assert f.readline() == b"TRAC:DATA?\r\n"
+			conn.sendall(values.encode() + b"\n" + b"0123456789")
+			assert f.readline() == b"*IDN?\r\n"
+			for c in b"IDN\n":
+				conn.sendall(bytes([c]))
+
+	t = threading.Thread(target=serve)
+	t.start()
+
+	scpi = SCPI(srv.getsockname(), bufsize=64)
+	scpi.__enter__()
+	try:
+		assert scpi.ask("TRAC:DATA?") == values
+		assert scpi.read(4) == b"0123"
+		assert scpi.read(6) == b"456789"
+		assert scpi.ask("*IDN?") == "IDN"
+	finally:
+		scpi.__exit__(None, None, None)
+		t.join()
+		srv.close()
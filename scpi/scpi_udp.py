@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Basic SCPI interface for UDP
+# SPDX-License-Identifier: MIT
+
+"""
+SCPI-over-UDP, as spoken by eg. the KORAD KEL-103 (port 18190).
+
+Each program message is sent as one datagram, and each response comes
+back as one datagram.
+
+There's nothing in the protocol to tie a response to its query, so:
+
+- the socket is connected, so that only datagrams from the instrument
+  are received;
+- pending (late) datagrams are discarded before sending a query, so
+  that a response to a previous, timed-out attempt isn't mistaken for
+  the current response;
+- queries are re-sent when no response arrives in time, a bounded
+  amount of times; plain writes aren't acknowledged so can't be
+  retried.
+
+"""
+
+import socket
+import logging
+
+from .batch import BatchMixin
+
+
+logger = logging.getLogger(__name__)
+
+
+class SCPI(BatchMixin):
+	def __init__(self, endpoint, eol_tx=b"\n", eol_rx=b"\n", timeout=0.5, retries=3):
+		"""
+		:param endpoint: (host, port)
+		:param timeout: time to wait for a response (s)
+		:param retries: amount of times a query is re-sent when
+		 there's no response
+		"""
+		self._endpoint = endpoint
+		self._eol_tx = eol_tx
+		self._eol_rx = eol_rx
+		self._timeout = timeout
+		self._retries = retries
+		self._bufsize = 65536
+		self.stats = None
+
+	def __str__(self):
+		return "(SCPI_UDP)"
+
+	def __enter__(self):
+		logger.debug("%s enter", self)
+		host, port = self._endpoint
+		family, type, proto, canonname, sockaddr = socket.getaddrinfo(
+		 host, port, type=socket.SOCK_DGRAM)[0]
+		self.sock = socket.socket(family, socket.SOCK_DGRAM)
+		self.sock.connect(sockaddr)
+		self.sock.settimeout(self._timeout)
+		return self
+
+	def __exit__(self, exc_type, exc_value, exc_traceback):
+		logger.debug("%s exit", self)
+		self.sock.close()
+
+	def _drain(self):
+		"""
+		Discard datagrams received outside of a query
+		"""
+		self.sock.setblocking(False)
+		try:
+			while True:
+				try:
+					x = self.sock.recv(self._bufsize)
+				except (BlockingIOError, ConnectionRefusedError):
+					break
+				logger.debug("Discarding stale %s", x)
+		finally:
+			self.sock.settimeout(self._timeout)
+
+	def _send(self, cmd):
+		logger.debug("> %s", cmd)
+		data = cmd.encode() + self._eol_tx
+		if self.stats is not None:
+			self.stats.tx(len(data))
+		self.sock.send(data)
+
+	def write(self, cmd):
+		stats = self.stats
+		if stats is None:
+			return self._send(cmd)
+		t0 = stats.clock()
+		self._send(cmd)
+		stats.command(cmd, t0, "write")
+
+	def _read_response(self):
+		try:
+			x = self.sock.recv(self._bufsize)
+		except socket.timeout:
+			if self.stats is not None:
+				self.stats.timeout()
+			raise
+		if self.stats is not None:
+			self.stats.rx(len(x))
+		if x.endswith(self._eol_rx):
+			x = x[:-len(self._eol_rx)]
+		res = x.decode('ascii').rstrip()
+		logger.debug("< %s", res)
+		return res
+
+	def ask(self, cmd):
+		stats = self.stats
+		if stats is not None:
+			t0 = stats.clock()
+		self._drain()
+		for i in range(self._retries + 1):
+			if i > 0 and stats is not None:
+				stats.retry()
+			self._send(cmd)
+			try:
+				res = self._read_response()
+			except (socket.timeout, ConnectionRefusedError) as e:
+				logger.warning("%s no response to %s (%s), attempt %d/%d",
+				 self, cmd, e, i+1, self._retries+1)
+				continue
+			if stats is not None:
+				stats.command(cmd, t0)
+			return res
+		raise TimeoutError(f"No response to {cmd!r}")
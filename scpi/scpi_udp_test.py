@@ -0,0 +1,43 @@
+import logging
+import socket
+import threading
+
+from .scpi_udp import SCPI
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_lossy():
+	srv = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	srv.bind(("127.0.0.1", 0))
+	srv.settimeout(5)
+
+	def serve():
+		"""
+		KEL-103 stand-in, losing the first response
+		"""
+		count = 0
+		while True:
+			x, addr = srv.recvfrom(1024)
+			if x == b"quit\n":
+				break
+			count += 1
+			if count == 1:
+				continue
+			if x == b"*IDN?\n":
+				srv.sendto(b"KORAD-KEL103 V3.30 SN:00000000\n", addr)
+			elif x == b":MEAS:VOLT?;:MEAS:CURR?\n":
+				srv.sendto(b"12.000V;1.500A\n", addr)
+
+	t = threading.Thread(target=serve)
+	t.start()
+
+	try:
+		with SCPI(srv.getsockname(), timeout=0.1, retries=2) as scpi:
+			assert scpi.ask("*IDN?").startswith("KORAD-KEL103")
+			assert scpi.ask_many((":MEAS:VOLT?", "MEAS:CURR?")) == ["12.000V", "1.500A"]
+			scpi.write("quit")
+	finally:
+		t.join()
+		srv.close()
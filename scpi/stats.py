@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Per-command instrumentation for SCPI transports
+# SPDX-License-Identifier: MIT
+
+"""
+Transports have a ``stats`` attribute, None by default, in which case
+the only cost is a check of that attribute per call.
+
+When set to a Stats object, it records:
+
+- per-command round-trip latency histograms (commands are keyed by
+  their headers, so ``:VOLT 1.2`` and ``:VOLT 3.4`` are the same);
+- bytes sent and received;
+- retries and timeouts;
+- optionally, a timeline of the last commands, which can be exported
+  in Chrome trace event format (chrome://tracing, Perfetto).
+
+.. code:: python
+
+   scpi.stats = Stats(trace=True)
+   ...
+   for k, v in scpi.stats.summary().items():
+       logger.info("%s: %s", k, v)
+   with io.open("trace.json", "w") as fo:
+       scpi.stats.dump_chrome_trace(fo)
+
+"""
+
+import collections
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class Stats:
+	# Latency histogram buckets, from 1 µs, 4 per octave
+	bucket_min = 1e-6
+	buckets_per_octave = 4
+	bucket_count = 4 * 28
+
+	def __init__(self, trace=False, trace_depth=100000):
+		"""
+		:param trace: whether to keep a timeline of commands
+		:param trace_depth: max. amount of commands kept in timeline
+		"""
+		self.clock = time.perf_counter
+		self._lock = threading.Lock()
+		self._trace_depth = trace_depth
+		self.trace = trace
+		self.reset()
+
+	def reset(self):
+		with self._lock:
+			self.bytes_tx = 0
+			self.bytes_rx = 0
+			self.retries = 0
+			self.timeouts = 0
+			self._commands = dict()
+			self._events = collections.deque(maxlen=self._trace_depth)
+
+	def tx(self, n):
+		self.bytes_tx += n
+
+	def rx(self, n):
+		self.bytes_rx += n
+
+	def retry(self):
+		self.retries += 1
+
+	def timeout(self):
+		self.timeouts += 1
+
+	@staticmethod
+	def key(cmd):
+		return ";".join(x.strip().split(" ", 1)[0] for x in cmd.split(";"))
+
+	def bucket(self, dt):
+		if dt <= self.bucket_min:
+			return 0
+		idx = int(math.log2(dt / self.bucket_min) * self.buckets_per_octave)
+		return min(idx, self.bucket_count - 1)
+
+	def bucket_edges(self):
+		"""
+		:return: lower edge of each latency bucket (s)
+		"""
+		return [ self.bucket_min * 2 ** (i / self.buckets_per_octave)
+		 for i in range(self.bucket_count) ]
+
+	def command(self, cmd, t0, kind="ask"):
+		"""
+		Record a command, which started at t0 and just completed
+		"""
+		t1 = self.clock()
+		dt = t1 - t0
+		key = self.key(cmd)
+		with self._lock:
+			try:
+				c = self._commands[key]
+			except KeyError:
+				c = self._commands[key] = dict(
+				 count=0,
+				 total=0.0,
+				 min=math.inf,
+				 max=0.0,
+				 histogram=[0] * self.bucket_count,
+				)
+			c["count"] += 1
+			c["total"] += dt
+			c["min"] = min(c["min"], dt)
+			c["max"] = max(c["max"], dt)
+			c["histogram"][self.bucket(dt)] += 1
+			if self.trace:
+				self._events.append((key, kind, t0, dt))
+
+	def histogram(self, key):
+		"""
+		:return: bucket edges, counts for command key
+		"""
+		with self._lock:
+			return self.bucket_edges(), list(self._commands[key]["histogram"])
+
+	def percentile(self, key, q):
+		"""
+		:return: latency percentile q (0-100) estimate, as the upper
+		 edge of the bucket containing it
+		"""
+		edges, counts = self.histogram(key)
+		target = sum(counts) * q / 100
+		acc = 0
+		for idx, count in enumerate(counts):
+			acc += count
+			if count and acc >= target:
+				return self.bucket_min * 2 ** ((idx + 1) / self.buckets_per_octave)
+		return math.nan
+
+	def summary(self):
+		"""
+		:return: dict of command key to dict of count, total, min,
+		 max, mean, p50, p99 (latencies in s)
+		"""
+		with self._lock:
+			keys = list(self._commands)
+		out = dict()
+		for key in keys:
+			c = dict(self._commands[key])
+			del c["histogram"]
+			c["mean"] = c["total"] / c["count"]
+			c["p50"] = self.percentile(key, 50)
+			c["p99"] = self.percentile(key, 99)
+			out[key] = c
+		return out
+
+	def chrome_trace(self, name="SCPI"):
+		"""
+		:return: timeline, as Chrome trace event format object
+		"""
+		pid = os.getpid()
+		tid = id(self)
+		with self._lock:
+			events = list(self._events)
+		return {
+		 "displayTimeUnit": "ms",
+		 "traceEvents": [
+		  dict(name="thread_name", ph="M", pid=pid, tid=tid, args=dict(name=name)),
+		 ] + [
+		  dict(
+		   name=key,
+		   cat=kind,
+		   ph="X",
+		   ts=t0 * 1e6,
+		   dur=dt * 1e6,
+		   pid=pid,
+		   tid=tid,
+		  ) for key, kind, t0, dt in events
+		 ],
+		}
+
+	def dump_chrome_trace(self, fo, name="SCPI"):
+		json.dump(self.chrome_trace(name), fo)
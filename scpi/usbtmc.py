@@ -1,8 +1,18 @@
 import usbtmc
 
-class SCPI:
+from .batch import BatchMixin
+from . import block
+
+
+class SCPI(BatchMixin):
+	"""
+	SCPI over USBTMC, using python-usbtmc.
+
+	Set stats to a .stats.Stats object to instrument.
+	"""
 	def __init__(self, *args, **kw):
 		self.args = args, kw
+		self.stats = None
 
 	def __enter__(self):
 		args, kw = self.args
@@ -12,10 +22,42 @@ class SCPI:
 		self.s.close()
 
 	def ask(self, command):
-		return self.s.ask(command)
+		stats = self.stats
+		if stats is None:
+			return self.s.ask(command)
+		t0 = stats.clock()
+		stats.tx(len(command))
+		res = self.s.ask(command)
+		stats.rx(len(res))
+		stats.command(command, t0)
+		return res
 
 	def write(self, command):
-		return self.s.write(command)
+		stats = self.stats
+		if stats is None:
+			return self.s.write(command)
+		t0 = stats.clock()
+		stats.tx(len(command))
+		res = self.s.write(command)
+		stats.command(command, t0, "write")
+		return res
+
+	def _read_response(self):
+		res = self.s.read()
+		if self.stats is not None:
+			self.stats.rx(len(res))
+		return res
+
+	def read_raw(self, amount=-1):
+		res = self.s.read_raw(amount)
+		if self.stats is not None:
+			self.stats.rx(len(res))
+		return res
+
+	def read_block(self, dtype="u1"):
+		"""
+		Read a definite-length block response
 
-	def read_raw(self, amount):
-		return self.s.read_raw(amount)
+		:return: array viewing the received message
+		"""
+		return block.decode(self.read_raw(), dtype)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Run simulated instruments, or load-test transports against them
+# SPDX-License-Identifier: MIT
+
+import logging
+import sys
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+	import argparse
+
+	from . import sim_instruments
+	from .sim_scpi import Simulator
+
+	kinds = {
+	 "e3634a": (sim_instruments.E3634A, ("MEAS:VOLT?", "MEAS:CURR?")),
+	 "kel103": (sim_instruments.KEL103, (":MEAS:VOLT?", ":MEAS:CURR?")),
+	 "fluke8845": (sim_instruments.Fluke8845, ("INIT; FETCH1?",)),
+	 "keithley6485": (sim_instruments.Keithley6485, ("MEAS?",)),
+	 "tek": (sim_instruments.TekScope, ("MEASUrement:MEAS1:VALue?",)),
+	}
+
+	parser = argparse.ArgumentParser(
+	 description="SCPI instrument simulators",
+	)
+
+	parser.add_argument("--log-level",
+	 default="INFO",
+	 help="Logging level (eg. INFO, see Python logging docs)",
+	)
+
+	parser.add_argument("--instrument",
+	 choices=sorted(kinds),
+	 default="e3634a",
+	)
+
+	parser.add_argument("--count",
+	 type=int,
+	 default=1,
+	 help="Amount of simulated instruments",
+	)
+
+	parser.add_argument("--latency",
+	 type=float,
+	 default=0.0,
+	 help="Response latency (s)",
+	)
+
+	parser.add_argument("--transport",
+	 choices=("tcp", "udp", "pty"),
+	 default="tcp",
+	)
+
+	subparsers = parser.add_subparsers(
+	 help='the command; type "%s COMMAND -h" for command-specific help' % sys.argv[0],
+	 dest='command',
+	)
+
+	subp = subparsers.add_parser(
+	 "serve",
+	 help="Serve simulated instruments until interrupted",
+	)
+
+	def do_serve(sim, addresses, args):
+		for address in addresses:
+			logger.info("Serving %s on %s", args.instrument, address)
+		try:
+			while True:
+				time.sleep(1)
+		except KeyboardInterrupt:
+			pass
+
+	subp.set_defaults(func=do_serve)
+
+	subp = subparsers.add_parser(
+	 "bench",
+	 help="Query simulated instruments from one thread each",
+	)
+
+	subp.add_argument("--duration",
+	 type=float,
+	 default=5.0,
+	)
+
+	def do_bench(sim, addresses, args):
+		import contextlib
+		from ..scpi.stats import Stats
+
+		queries = kinds[args.instrument][1]
+		stats = []
+		stop = threading.Event()
+
+		def client(address):
+			with contextlib.ExitStack() as stack:
+				if args.transport == "tcp":
+					from ..scpi.scpi_tcp import SCPI
+					scpi = SCPI(address)
+					stack.enter_context(scpi)
+				elif args.transport == "udp":
+					from ..scpi.scpi_udp import SCPI
+					scpi = stack.enter_context(SCPI(address))
+				else:
+					import serial
+					from ..scpi.scpi_serial import SCPI
+					ser = stack.enter_context(serial.Serial(address, timeout=1))
+					scpi = stack.enter_context(SCPI(ser, eol=b"\n"))
+				scpi.stats = Stats()
+				stats.append(scpi.stats)
+				while not stop.is_set():
+					for query in queries:
+						scpi.ask(query)
+
+		threads = [ threading.Thread(target=client, args=(x,)) for x in addresses ]
+		t0 = time.monotonic()
+		for t in threads:
+			t.start()
+		time.sleep(args.duration)
+		stop.set()
+		for t in threads:
+			t.join()
+		t1 = time.monotonic()
+
+		for query in queries:
+			key = Stats.key(query)
+			count = sum(s.summary()[key]["count"] for s in stats)
+			p50 = max(s.percentile(key, 50) for s in stats)
+			p99 = max(s.percentile(key, 99) for s in stats)
+			logger.info("%s: %d commands, %.1f commands/s, p50 <= %.3f ms, p99 <= %.3f ms",
+			 query, count, count / (t1-t0), p50 * 1e3, p99 * 1e3)
+
+	subp.set_defaults(func=do_bench)
+
+	try:
+		import argcomplete
+		argcomplete.autocomplete(parser)
+	except:
+		pass
+
+	args = parser.parse_args(argv)
+
+	logging.basicConfig(
+	 datefmt="%Y%m%dT%H%M%S",
+	 level=getattr(logging, args.log_level),
+	 format="%(asctime)-15s %(name)s %(levelname)s %(message)s"
+	)
+
+	if getattr(args, 'func', None) is None:
+		parser.print_help()
+		return 1
+
+	cls = kinds[args.instrument][0]
+	with Simulator() as sim:
+		add = getattr(sim, f"add_{args.transport}")
+		addresses = [ add(cls(latency=args.latency)) for i in range(args.count) ]
+		args.func(sim, addresses, args)
+	return 0
+
+
+if __name__ == "__main__":
+	ret = main()
+	raise SystemExit(ret)
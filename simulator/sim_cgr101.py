@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Simulated Syscomp CGR-101 scope / generator
+# SPDX-License-Identifier: MIT
+
+"""
+Serves the CGR-101 protocol on a pty, as used by
+..oscilloscope.scope_cgr101.Scope.
+
+The generator output is connected to input A, and through a RC
+low-pass filter to input B, so that the frequency response is known:
+
+.. code:: python
+
+   with CGR101() as sim:
+       with serial.Serial(sim.path) as ser, Scope(ser) as scope:
+           ...
+
+"""
+
+import logging
+import math
+import os
+import select
+import threading
+import time
+import tty
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class CGR101:
+	def __init__(self, cutoff=10e3, noise=0.005, trigger_period=1e-3, baudrate=None, seed=0):
+		"""
+		:param cutoff: cut-off frequency of the filter before input B
+		:param noise: RMS noise on inputs (V)
+		:param trigger_period: period of the external trigger (s)
+		:param baudrate: simulated link speed for buffer downloads,
+		 None for no delay
+		"""
+		self.cutoff = cutoff
+		self.noise = noise
+		self.trigger_period = trigger_period
+		self.baudrate = baudrate
+		self.rng = np.random.default_rng(seed)
+		self.frequency = 1000.0
+		self.amplitude = 1.0
+		self.sample_rate_div = 0
+		self.high = [0, 0]
+		self.table = np.sin(2 * np.pi * np.arange(256) / 256)
+		self.gains = { 0: 0.00592, 1: 0.0521 }
+		self.armed = None
+		self.frames = 0
+		self._buffer = None
+
+	def __enter__(self):
+		self._master, self._slave = os.openpty()
+		tty.setraw(self._slave)
+		self.path = os.ttyname(self._slave)
+		self._running = True
+		self._thread = threading.Thread(target=self.run, daemon=True)
+		self._thread.start()
+		return self
+
+	def __exit__(self, exc_type, exc_value, exc_traceback):
+		self._running = False
+		self._thread.join()
+		os.close(self._master)
+		os.close(self._slave)
+
+	@property
+	def sample_rate(self):
+		return 20e6 / 2**self.sample_rate_div
+
+	def _signal(self, t):
+		"""
+		:return: voltages on inputs A and B at times t
+		"""
+		f = self.frequency
+		w = 2 * np.pi * f
+		x = f * t % 1 * 256
+		idx = np.int32(x)
+		frac = x - idx
+		table = self.table
+		a = self.amplitude * (table[idx] * (1 - frac) + table[(idx + 1) % 256] * frac)
+		ratio = f / self.cutoff
+		gain = 1 / math.sqrt(1 + ratio**2)
+		phase = -math.atan(ratio)
+		b = self.amplitude * gain * np.sin(w * t + phase)
+		a = a + self.rng.normal(0, self.noise, t.shape)
+		b = b + self.rng.normal(0, self.noise, t.shape)
+		return a, b
+
+	def _acquire(self):
+		"""
+		Acquire a frame, the trigger being at a random position
+		:return: trigger position as reported
+		"""
+		pos = int(self.rng.integers(0, 1024))
+		jitter = self.rng.uniform(0, 1)
+		t = (np.arange(1024) - pos + jitter) / self.sample_rate
+		codes = []
+		for idx_chan, v in enumerate(self._signal(t)):
+			code = np.clip(np.round(511 - v / self.gains[self.high[idx_chan]]), 0, 1023)
+			codes.append(np.roll(code, -pos))
+		self._buffer = np.stack(codes, axis=1).astype(">u2").tobytes()
+		self.frames += 1
+		return 1023 - pos
+
+	def _write(self, data):
+		if self.baudrate is not None:
+			time.sleep(len(data) * 10 / self.baudrate)
+		os.write(self._master, data)
+
+	def handle(self, line):
+		words = line.split()
+		if not words:
+			return
+		if words == ["i"]:
+			self._write(b"Syscomp CGR-101 simulator\r\n")
+		elif words[:2] == ["S", "P"]:
+			chan = words[2]
+			self.high["ab".index(chan.lower())] = int(chan.isupper())
+		elif words[:2] == ["S", "R"]:
+			self.sample_rate_div = int(words[2]) & 0x0f
+		elif words[:2] == ["S", "G"]:
+			period = 1024 / self.sample_rate
+			self.armed = time.monotonic() + max(period, self.trigger_period)
+		elif words[:2] == ["S", "B"]:
+			if self._buffer is None:
+				self._acquire()
+			self._write(b"D" + self._buffer)
+		elif words[:2] == ["W", "F"]:
+			p = [int(x) for x in words[2:6]]
+			phase = (p[0] << 24) | (p[1] << 16) | (p[2] << 8) | p[3]
+			self.frequency = phase * 0.09313225746
+		elif words[:2] == ["W", "A"]:
+			self.amplitude = int(words[2]) / 255
+		elif words[:2] == ["W", "S"]:
+			self.table[int(words[2])] = (int(words[3]) - 128) / 127
+		else:
+			logger.debug("Ignored %s", line)
+
+	def run(self):
+		rx = b""
+		while self._running:
+			timeout = 0.01
+			if self.armed is not None:
+				timeout = max(0, min(timeout, self.armed - time.monotonic()))
+			r, w, x = select.select([self._master], [], [], timeout)
+			if r:
+				rx += os.read(self._master, 4096)
+				while b"\n" in rx:
+					line, rx = rx.split(b"\n", 1)
+					self.handle(line.decode())
+			if self.armed is not None and time.monotonic() >= self.armed:
+				self.armed = None
+				pos = self._acquire()
+				self._write(b"A" + pos.to_bytes(2, "big"))
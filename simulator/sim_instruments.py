@@ -0,0 +1,458 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Simulated versions of the SCPI instruments having drivers here
+# SPDX-License-Identifier: MIT
+
+"""
+The simulations implement the commands used by the drivers, keep
+state, and produce plausible measurements:
+
+- the PSU and the load are connected to a resistor / a source;
+- the multimeters read a noisy value;
+- the scope acquires a noisy sine.
+
+"""
+
+import logging
+import math
+import random
+import struct
+
+from .sim_scpi import Instrument, command
+
+
+logger = logging.getLogger(__name__)
+
+
+def on_off(x):
+	return x.upper() in ("1", "ON")
+
+
+class E3634A(Instrument):
+	"""
+	Keysight / HP E3634A PSU, loaded by a resistor
+	"""
+	idn = "HEWLETT-PACKARD,E3634A,0,2.1-5.0-1.0"
+
+	def __init__(self, latency=0.0, load=10.0):
+		self.load = load
+		Instrument.__init__(self, latency)
+
+	def reset(self):
+		self.output = False
+		self.voltage = 0.0
+		self.current = 7.0
+		self.saved = dict()
+
+	def _sense(self):
+		if not self.output:
+			return 0.0, 0.0
+		u = min(self.voltage, self.current * self.load)
+		return u, u / self.load
+
+	@command("OUTPut", "OUTPut:STATe", "OUT")
+	def outp(self, args):
+		self.output = on_off(args)
+
+	@command("OUTPut?", "OUTPut:STATe?")
+	def outp_q(self, args):
+		return str(int(self.output))
+
+	@command("VOLTage", "SOURce:VOLTage")
+	def volt(self, args):
+		value = float(args)
+		if not 0 <= value <= 51.5:
+			self.errors.append('-222,"Data out of range"')
+			return
+		self.voltage = value
+
+	@command("VOLTage?", "SOURce:VOLTage?")
+	def volt_q(self, args):
+		return f"{self.voltage:+.8E}"
+
+	@command("CURRent", "SOURce:CURRent")
+	def curr(self, args):
+		value = float(args)
+		if not 0 <= value <= 7.21:
+			self.errors.append('-222,"Data out of range"')
+			return
+		self.current = value
+
+	@command("CURRent?", "SOURce:CURRent?")
+	def curr_q(self, args):
+		return f"{self.current:+.8E}"
+
+	@command("MEASure:VOLTage?", "MEASure:VOLTage:DC?")
+	def meas_volt(self, args):
+		return f"{self._sense()[0]:+.8E}"
+
+	@command("MEASure:CURRent?", "MEASure:CURRent:DC?")
+	def meas_curr(self, args):
+		return f"{self._sense()[1]:+.8E}"
+
+	@command("*SAV")
+	def sav(self, args):
+		self.saved[int(args)] = (self.voltage, self.current)
+
+	@command("*RCL")
+	def rcl(self, args):
+		self.voltage, self.current = self.saved.get(int(args), (0.0, 7.0))
+
+
+class KEL103(Instrument):
+	"""
+	KORAD KEL-103 load, connected to a source with internal resistance
+	"""
+	idn = "KORAD-KEL103 V3.30 SN:00000000"
+
+	def __init__(self, latency=0.0, ocv=12.0, resistance=0.1):
+		self.ocv = ocv
+		self.resistance = resistance
+		Instrument.__init__(self, latency)
+
+	def reset(self):
+		self.func = "CC"
+		self.setpoints = dict(CURR=0.0, VOLT=0.0, RES=1000.0, POW=0.0)
+		self.input = False
+		self.dyn = None
+		self.saved = dict()
+
+	def _sense(self):
+		ocv, r = self.ocv, self.resistance
+		if not self.input:
+			return ocv, 0.0
+		if self.func == "CC":
+			i = min(self.setpoints["CURR"], ocv / r)
+		elif self.func == "CV":
+			i = max(0, (ocv - self.setpoints["VOLT"]) / r)
+		elif self.func == "CR":
+			i = ocv / (r + self.setpoints["RES"])
+		else:
+			# u i = p with u = ocv - r i
+			p = min(self.setpoints["POW"], ocv**2 / (4 * r))
+			i = (ocv - math.sqrt(ocv**2 - 4 * r * p)) / (2 * r)
+		return ocv - r * i, i
+
+	def create_setpoint(kw, unit):
+		@command(kw[0] + kw[1:].lower())
+		def set(self, args):
+			self.setpoints[kw] = float(args.upper().rstrip(unit))
+			self.func = {"CURR": "CC", "VOLT": "CV", "RES": "CR", "POW": "CW"}[kw]
+
+		@command(kw[0] + kw[1:].lower() + "?")
+		def get(self, args):
+			return f"{self.setpoints[kw]:.3f}{unit}"
+
+		return set, get
+
+	curr, curr_q = create_setpoint("CURR", "A")
+	volt, volt_q = create_setpoint("VOLT", "V")
+	res, res_q = create_setpoint("RES", "OHM")
+	pow, pow_q = create_setpoint("POW", "W")
+
+	@command("FUNC")
+	def func_set(self, args):
+		self.func = args.upper()
+
+	@command("FUNC?")
+	def func_q(self, args):
+		if self.dyn is not None:
+			return "CONTINUOUS CV"
+		return self.func
+
+	@command("MEASure:CURRent?")
+	def meas_curr(self, args):
+		return f"{self._sense()[1]:.3f}A"
+
+	@command("MEASure:VOLTage?")
+	def meas_volt(self, args):
+		return f"{self._sense()[0]:.3f}V"
+
+	@command("MEASure:POWer?")
+	def meas_pow(self, args):
+		u, i = self._sense()
+		return f"{u*i:.3f}W"
+
+	@command("INP")
+	def inp(self, args):
+		self.input = on_off(args)
+		if not self.input:
+			self.dyn = None
+
+	@command("INP?")
+	def inp_q(self, args):
+		return "ON" if self.input else "OFF"
+
+	@command("DYN")
+	def dyn_set(self, args):
+		self.dyn = args
+
+	@command("DYN?")
+	def dyn_q(self, args):
+		return self.dyn or ""
+
+	@command("*TRG")
+	def trg(self, args):
+		pass
+
+	@command("*SAV")
+	def sav(self, args):
+		self.saved[int(args)] = (self.func, dict(self.setpoints))
+
+	@command("*RCL")
+	def rcl(self, args):
+		func, setpoints = self.saved.get(int(args), ("CC", self.setpoints))
+		self.func, self.setpoints = func, dict(setpoints)
+
+
+class Fluke8845(Instrument):
+	"""
+	Fluke 8845A/8846A DMM
+	"""
+	idn = "FLUKE,8845A,0000000,08/02/10-11:53"
+	eol_tx = b"\r\n"
+
+	def __init__(self, latency=0.0, value=1.0, noise=1e-3):
+		self.value = value
+		self.noise = noise
+		Instrument.__init__(self, latency)
+
+	def reset(self):
+		self.remote = False
+		self.sample_count = 1
+
+	def _reading(self):
+		return f"{random.gauss(self.value, self.noise):+.8E}"
+
+	@command("SYSTem:REMote")
+	def rem(self, args):
+		self.remote = True
+
+	@command("SYSTem:LOCal")
+	def loc(self, args):
+		self.remote = False
+
+	@command("SAMPle:COUNt")
+	def samp_coun(self, args):
+		self.sample_count = int(args)
+
+	@command("*TRG", "INITiate")
+	def init(self, args):
+		pass
+
+	@command("READ?")
+	def read(self, args):
+		return ",".join(self._reading() for i in range(self.sample_count))
+
+	@command("FETCh<n>?")
+	def fetch(self, args, function):
+		return self._reading()
+
+	@command("MEASure:VOLTage:DC?", "MEASure:CURRent:DC?", "MEASure:RESistance?")
+	def meas(self, args):
+		return self._reading()
+
+
+class Keithley6485(Instrument):
+	"""
+	Keithley 6485 picoammeter
+	"""
+	idn = "KEITHLEY INSTRUMENTS INC.,MODEL 6485,0000000,C01   Jun 23 2003 12:00:00/A02  /E"
+
+	def __init__(self, latency=0.0, value=1e-9, noise=1e-12):
+		self.value = value
+		self.noise = noise
+		Instrument.__init__(self, latency)
+
+	def reset(self):
+		self.trace_points = 100
+		self.trigger_count = 1
+		self.config = dict()
+
+	def _reading(self):
+		return random.gauss(self.value, self.noise)
+
+	@command("MEASure?", "MEASure:CURRent?", "READ?")
+	def meas(self, args):
+		return f"{self._reading():+.6E}A,{0:+.6E},{0:+.6E}"
+
+	@command("TRACe:POINts")
+	def trac_poin(self, args):
+		self.trace_points = int(args)
+
+	@command("TRIGger:COUNt")
+	def trig_coun(self, args):
+		self.trigger_count = int(args)
+
+	@command("TRACe:DATA?")
+	def trac_data(self, args):
+		n = min(self.trace_points, self.trigger_count)
+		return ",".join(f"{self._reading():+.6E},{i*1e-3:+.6E}" for i in range(n))
+
+	@command(
+	 "FORMat:ELEMents",
+	 "TRIGger:DELay",
+	 "NPLCycles",
+	 "SENSe:CURRent:NPLCycles",
+	 "RANGe",
+	 "SENSe:CURRent:RANGe",
+	 "SYSTem:ZCHeck",
+	 "SYSTem:AZERo:STATe",
+	 "DISPlay:ENABle",
+	 "TRACe:CLEar",
+	 "TRACe:FEED:CONTrol",
+	 "STATus:MEASurement:ENABle",
+	 "*SRE",
+	 "INITiate",
+	)
+	def configure(self, args):
+		pass
+
+
+class TekScope(Instrument):
+	"""
+	Tektronix TDS2000-series scope, acquiring noisy sines
+	"""
+	idn = "TEKTRONIX,TDS 2012B,C000000,CF:91.1CT FV:v22.11"
+
+	def __init__(self, latency=0.0, points=2500):
+		self.points = points
+		Instrument.__init__(self, latency)
+
+	def reset(self):
+		self.source = 1
+		self.width = 2
+		self.encoding = "RIB"
+		# MATH is a 3rd, synthetic channel
+		self.volts_div = {1: 1.0, 2: 2.0, 3: 1.0}
+		self.selected = {1: True, 2: True}
+		self.sec_div = 5e-4
+		self.measurements = { i: dict(TYPE="MEAN", SOURCE="CH1") for i in range(1, 5) }
+
+	def _curve(self, channel):
+		t = self._time()
+		v = math.pi * 2 * 1000 * channel
+		ymult = self.volts_div[channel] * 10 / 65536 * 2**(16 - 8 * self.width)
+		# offset out of the way of the representable range
+		limit = 2**(8 * self.width - 1) - 1
+		return [ max(-limit, min(limit, int(round(
+		 (math.sin(v * x) + random.gauss(0, 0.01)) / ymult))))
+		 for x in t ], ymult
+
+	def _time(self):
+		xincr = self.sec_div * 10 / self.points
+		xzero = -self.sec_div * 5
+		return [ xzero + i * xincr for i in range(self.points) ]
+
+	def _preamble(self):
+		channel = self.source
+		xincr = self.sec_div * 10 / self.points
+		ymult = self.volts_div[channel] * 10 / 65536 * 2**(16 - 8 * self.width)
+		return [
+		 str(self.width),
+		 str(8 * self.width),
+		 "BIN",
+		 "RI" if self.encoding in ("RIB", "SRI") else "RP",
+		 "MSB" if self.encoding == "RIB" else "LSB",
+		 str(self.points),
+		 f'"Ch{channel}, DC coupling, {self.volts_div[channel]:.1E} V/div, {self.sec_div:.1E} s/div, {self.points} points, Sample mode"',
+		 "Y",
+		 f"{xincr:.1E}",
+		 "0",
+		 f"{-self.sec_div * 5:.2E}",
+		 '"s"',
+		 f"{ymult:.3E}",
+		 "0.0E0",
+		 "0.0E0",
+		 '"Volts"',
+		]
+
+	@command("WFMPre?", "WFMOutpre?")
+	def wfmpre(self, args):
+		return ";".join(self._preamble())
+
+	fields = (
+	 "BYT_Nr", "BIT_Nr", "ENCdg", "BN_Fmt", "BYT_Or", "NR_Pt", "WFId",
+	 "PT_Fmt", "XINcr", "PT_Off", "XZEro", "XUNit", "YMUlt", "YZEro",
+	 "YOFf", "YUNit",
+	)
+
+	@command(*[ f"WFMPre:{x}?" for x in fields ] + [ f"WFMOutpre:{x}?" for x in fields ])
+	def wfmpre_field(self, args):
+		node = self.header.split(":")[1].rstrip("?")
+		for idx, field in enumerate(self.fields):
+			short = "".join(c for c in field if not c.islower()).upper()
+			if node in (short, field.upper()):
+				return self._preamble()[idx]
+
+	@command("DATa:SOUrce")
+	def data_source(self, args):
+		args = args.upper()
+		self.source = 3 if args == "MATH" else int(args.lstrip("CH"))
+
+	@command("DATa:SOUrce?")
+	def data_source_q(self, args):
+		return "MATH" if self.source == 3 else f"CH{self.source}"
+
+	@command("DATa:WIDth")
+	def data_width(self, args):
+		self.width = int(args)
+
+	@command("DATa:ENCdg")
+	def data_encdg(self, args):
+		self.encoding = args.upper()[:3]
+
+	@command("CH<n>:VOLts")
+	def ch_volts(self, args, channel):
+		self.volts_div[channel] = float(args)
+
+	@command("SELect:CH<n>")
+	def select(self, args, channel):
+		self.selected[channel] = args.upper() in ("1", "ON")
+
+	@command("SELect:CH<n>?")
+	def select_q(self, args, channel):
+		return "1" if self.selected[channel] else "0"
+
+	@command("HORizontal:MAIn:SCAle")
+	def hor_scale(self, args):
+		self.sec_div = float(args)
+
+	@command("CURVe?")
+	def curve(self, args):
+		values, ymult = self._curve(self.source)
+		fmt = {1: "b", 2: "h"}[self.width]
+		order = ">" if self.encoding == "RIB" else "<"
+		data = struct.pack(f"{order}{len(values)}{fmt}", *values)
+		length = str(len(data))
+		return f"#{len(length)}{length}".encode() + data
+
+	@command("MEASUrement:MEAS<n>:TYPe")
+	def meas_type(self, args, n):
+		self.measurements[n]["TYPE"] = args.upper()
+
+	@command("MEASUrement:MEAS<n>:SOUrce")
+	def meas_source(self, args, n):
+		self.measurements[n]["SOURCE"] = args.upper()
+
+	@command("MEASUrement:MEAS<n>:VALue?")
+	def meas_value(self, args, n):
+		m = self.measurements[n]
+		values, ymult = self._curve(int(m["SOURCE"].lstrip("CH")))
+		values = [ x * ymult for x in values ]
+		kind = m["TYPE"]
+		if kind == "MEAN":
+			res = sum(values) / len(values)
+		elif kind in ("RMS", "CRMS"):
+			res = math.sqrt(sum(x*x for x in values) / len(values))
+		elif kind == "PK2PK":
+			res = max(values) - min(values)
+		elif kind == "MAXI":
+			res = max(values)
+		elif kind == "MINI":
+			res = min(values)
+		elif kind == "FREQ":
+			res = 1000.0 * int(m["SOURCE"].lstrip("CH"))
+		else:
+			res = 9.9E37
+		return f"{res:.8E}"
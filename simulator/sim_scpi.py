@@ -0,0 +1,308 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Simulated SCPI instruments
+# SPDX-License-Identifier: MIT
+
+"""
+Instrument subclasses declare their commands with the @command
+decorator, using the usual mixed-case notation (uppercase being the
+short form), with ``<n>`` for numeric suffixes:
+
+.. code:: python
+
+   class Thing(Instrument):
+       @command("MEASure:VOLTage?")
+       def meas_volt(self, args):
+           return "1.0"
+
+Handlers get the command arguments and numeric suffixes, and
+the header being handled is available as ``self.header``.
+
+Program messages can be compound (``;``-separated), responses of the
+queries they contain are ``;``-joined.
+
+Instruments are served by Simulator, which runs an asyncio event loop
+in a thread, so a single host can serve many instruments, over TCP,
+UDP (one datagram per message) or a pty (appearing as a serial port).
+Each has a configurable response latency.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import threading
+import tty
+
+
+logger = logging.getLogger(__name__)
+
+
+def command(*patterns):
+	def deco(f):
+		f._patterns = patterns
+		return f
+	return deco
+
+
+def compile_pattern(pattern):
+	"""
+	:return: regex matching the short or long form of the header
+	"""
+	out = ""
+	query = pattern.endswith("?")
+	pattern = pattern.rstrip("?")
+	for node in pattern.split(":"):
+		if node.startswith("*"):
+			out += re.escape(node)
+			continue
+		suffix = ""
+		if node.endswith("<n>"):
+			node = node[:-3]
+			suffix = r"(\d*)"
+		short = "".join(c for c in node if not c.islower())
+		rest = node[len(short):].upper()
+		if rest:
+			out += f":{short}(?:{rest})?{suffix}"
+		else:
+			out += f":{short}{suffix}"
+	if out.startswith(":"):
+		out = out[1:]
+	if query:
+		out += r"\?"
+	return re.compile(out)
+
+
+class Instrument:
+	idn = "SIMULATED,INSTRUMENT,0,0"
+	eol_rx = b"\n"
+	eol_tx = b"\n"
+
+	def __init_subclass__(cls, **kw):
+		super().__init_subclass__(**kw)
+		cls._commands = []
+		for klass in reversed(cls.__mro__):
+			for name, f in vars(klass).items():
+				for pattern in getattr(f, "_patterns", ()):
+					cls._commands.append((compile_pattern(pattern), name))
+
+	def __init__(self, latency=0.0):
+		"""
+		:param latency: time to respond to a query (s)
+		"""
+		self.latency = latency
+		self.errors = []
+		self.header = None
+		self.reset()
+
+	def reset(self):
+		pass
+
+	def handle(self, message):
+		"""
+		:param message: program message, without terminator
+		:return: response message (bytes) or None if no queries
+		"""
+		responses = []
+		for cmd in message.split(";"):
+			cmd = cmd.strip()
+			if not cmd:
+				continue
+			header, _, args = cmd.partition(" ")
+			header = header.upper().lstrip(":")
+			args = args.strip()
+			for regex, name in self._commands:
+				m = regex.fullmatch(header)
+				if m is None:
+					continue
+				suffixes = [int(x) if x else 1 for x in m.groups()]
+				self.header = header
+				res = getattr(self, name)(args, *suffixes)
+				break
+			else:
+				logger.debug("%s unknown command %s", self, cmd)
+				self.errors.append('-113,"Undefined header"')
+				res = None
+
+			if header.endswith("?") and res is None:
+				res = ""
+			if res is not None:
+				responses.append(res.encode() if isinstance(res, str) else res)
+
+		if not responses:
+			return None
+		return b";".join(responses)
+
+	@command("*IDN?")
+	def _idn(self, args):
+		return self.idn
+
+	@command("*RST")
+	def _rst(self, args):
+		self.reset()
+
+	@command("*CLS")
+	def _cls(self, args):
+		self.errors = []
+
+	@command("*OPC?")
+	def _opc(self, args):
+		return "1"
+
+	@command("SYSTem:ERRor?", "SYSTem:ERRor:NEXT?")
+	def _syst_err(self, args):
+		if self.errors:
+			return self.errors.pop(0)
+		return '+0,"No error"'
+
+
+class Simulator:
+	"""
+	Runs simulated instruments, in an event loop thread
+
+	.. code:: python
+
+	   with Simulator() as sim:
+	       host, port = sim.add_tcp(E3634A(latency=0.01))
+	"""
+	def __init__(self):
+		self.loop = asyncio.new_event_loop()
+		self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+		self._closers = []
+
+	def __enter__(self):
+		self._thread.start()
+		return self
+
+	def __exit__(self, exc_type, exc_value, exc_traceback):
+		self._run(self._close())
+		self.loop.call_soon_threadsafe(self.loop.stop)
+		self._thread.join()
+		self.loop.close()
+
+	def _run(self, coro):
+		return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+	async def _close(self):
+		for close in self._closers:
+			res = close()
+			if asyncio.iscoroutine(res):
+				await res
+
+	async def _respond(self, instrument, message):
+		res = instrument.handle(message.decode("ascii", errors="replace").rstrip("\r"))
+		if res is not None and instrument.latency:
+			await asyncio.sleep(instrument.latency)
+		return res
+
+	def add_tcp(self, instrument, host="127.0.0.1", port=0):
+		"""
+		:return: listening address
+		"""
+		async def client(reader, writer):
+			try:
+				while True:
+					try:
+						message = await reader.readuntil(instrument.eol_rx)
+					except asyncio.IncompleteReadError:
+						break
+					res = await self._respond(instrument, message[:-len(instrument.eol_rx)])
+					if res is not None:
+						writer.write(res + instrument.eol_tx)
+						await writer.drain()
+			except ConnectionError:
+				pass
+			finally:
+				writer.close()
+
+		async def start():
+			server = await asyncio.start_server(client, host, port)
+			self._closers.append(server.close)
+			return server.sockets[0].getsockname()[:2]
+
+		return self._run(start())
+
+	def add_udp(self, instrument, host="127.0.0.1", port=0):
+		"""
+		:return: listening address
+		"""
+		sim = self
+
+		class Protocol(asyncio.DatagramProtocol):
+			def connection_made(self, transport):
+				self.transport = transport
+
+			def datagram_received(self, data, addr):
+				async def respond():
+					res = await sim._respond(instrument, data.rstrip(b"\r\n"))
+					if res is not None:
+						self.transport.sendto(res + instrument.eol_tx, addr)
+				sim.loop.create_task(respond())
+
+		async def start():
+			transport, protocol = await self.loop.create_datagram_endpoint(
+			 Protocol, local_addr=(host, port))
+			self._closers.append(transport.close)
+			return transport.get_extra_info("sockname")[:2]
+
+		return self._run(start())
+
+	def add_pty(self, instrument):
+		"""
+		:return: path of the serial port to open
+		"""
+		master, slave = os.openpty()
+		tty.setraw(slave)
+		os.set_blocking(master, False)
+		path = os.ttyname(slave)
+		rx = bytearray()
+		tx = bytearray()
+		queue = asyncio.Queue()
+
+		def on_readable():
+			try:
+				rx.extend(os.read(master, 4096))
+			except (BlockingIOError, OSError):
+				return
+			while True:
+				idx = rx.find(instrument.eol_rx)
+				if idx < 0:
+					break
+				queue.put_nowait(bytes(rx[:idx]))
+				del rx[:idx+len(instrument.eol_rx)]
+
+		async def process():
+			while True:
+				message = await queue.get()
+				res = await self._respond(instrument, message)
+				if res is not None:
+					# written as the reader drains the pty, so that a
+					# slow one doesn't stall the loop
+					if not tx:
+						self.loop.add_writer(master, on_writable)
+					tx.extend(res + instrument.eol_tx)
+
+		def on_writable():
+			try:
+				n = os.write(master, tx)
+			except BlockingIOError:
+				return
+			except OSError:
+				n = len(tx)
+			del tx[:n]
+			if not tx:
+				self.loop.remove_writer(master)
+
+		async def start():
+			self.loop.add_reader(master, on_readable)
+			task = self.loop.create_task(process())
+			def close():
+				self.loop.remove_reader(master)
+				self.loop.remove_writer(master)
+				task.cancel()
+				os.close(master)
+				os.close(slave)
+			self._closers.append(close)
+
+		self._run(start())
+		return path
@@ -0,0 +1,247 @@
+import time
+import asyncio
+import logging
+
+import numpy as np
+import serial
+
+from .sim_scpi import Simulator
+from .sim_instruments import E3634A, KEL103, Fluke8845, Keithley6485, TekScope
+from ..scpi.scpi_serial import SCPI as SCPI_Serial
+from ..scpi.scpi_tcp import SCPI as SCPI_TCP
+from ..scpi.scpi_udp import SCPI as SCPI_UDP
+from ..scpi.scpi_tcp_async import SCPI as SCPI_TCP_Async
+from ..scpi.scpi_serial_async import SCPI as SCPI_Serial_Async
+
+
+logger = logging.getLogger(__name__)
+
+
+def test_psu():
+	from ..psu.psu_agilent_e3634a import PSU
+	with Simulator() as sim:
+		scpi = SCPI_TCP(sim.add_tcp(E3634A(load=10)))
+		scpi.__enter__()
+		try:
+			with PSU(scpi) as psu:
+				psu.voltage_setpoint_set(5)
+				psu.current_setpoint_set(1)
+				psu.enable()
+				assert psu.snapshot() == (5, 1, 5, 0.5)
+		finally:
+			scpi.__exit__(None, None, None)
+
+
+def test_load():
+	from ..load.load_korad_kel103 import Load
+	with Simulator() as sim:
+		with SCPI_UDP(sim.add_udp(KEL103(ocv=12, resistance=0.1))) as scpi:
+			with Load(scpi) as load:
+				with load.in_cc():
+					load.setpoint_set(2)
+					load.activate(True)
+					assert load.setpoint_get() == 2
+					assert load.measure_all() == (11.8, 2, 23.6)
+				assert scpi.ask(":FUNC?") == "CC"
+
+
+def test_load_cache():
+	from ..load.load_korad_kel103 import Load
+	from ..scpi.stats import Stats
+	with Simulator() as sim:
+		with SCPI_UDP(sim.add_udp(KEL103(ocv=12, resistance=0.1))) as scpi:
+			with Load(scpi, cache=True) as load:
+				scpi.stats = Stats()
+				for value in (1, 2, 3):
+					with load.in_cc():
+						load.setpoint_set(value)
+				# function queried once, setpoint written each time
+				assert {k: v["count"] for k, v in scpi.stats.summary().items()} == {
+				 ":FUNC?": 1,
+				 ":CURR": 3,
+				}
+
+				scpi.stats = Stats()
+				for value in (1, 2):
+					with load.in_cv():
+						load.setpoint_set(value)
+				# function changes are read back the first time
+				assert {k: v["count"] for k, v in scpi.stats.summary().items()} == {
+				 ":FUNC": 4,
+				 ":FUNC?": 2,
+				 ":VOLT": 2,
+				}
+				assert scpi.ask(":FUNC?") == "CC"
+
+
+def test_multimeters():
+	from ..multimeter.multimeter_keithley_6485 import Multimeter
+	with Simulator() as sim:
+		path = sim.add_pty(Keithley6485(value=1e-9, noise=0))
+		with serial.Serial(path, timeout=1) as ser, SCPI_Serial(ser, eol=b"\n") as scpi:
+			with Multimeter(scpi) as meter:
+				assert float(meter.measure_immediate()[:-1]) == 1e-9
+			scpi.write("TRAC:POIN 100")
+			scpi.write("TRIG:COUN 100")
+			assert len(scpi.ask("TRAC:DATA?").split(",")) == 200
+
+		scpi = SCPI_TCP(sim.add_tcp(Fluke8845(value=1.5, noise=0)))
+		scpi.__enter__()
+		try:
+			assert float(scpi.ask("MEAS:VOLT:DC? 100")) == 1.5
+			assert scpi.ask("INIT; FETCH1?; FETCH2?") == "+1.50000000E+00;+1.50000000E+00"
+		finally:
+			scpi.__exit__(None, None, None)
+
+
+def test_scope():
+	from ..oscilloscope.tek import Scope
+	with Simulator() as sim:
+		scpi = SCPI_TCP(sim.add_tcp(TekScope()))
+		scpi.__enter__()
+		try:
+			with Scope(scpi) as scope:
+				curve = scope.curve()
+				assert curve.shape == (2500,)
+				assert abs(np.max(curve) - 1) < 0.1
+
+				p = scope.preamble(2)
+				assert p.nr_pt == 2500 and p.yunit == "Volts"
+				res = scope.acquire()
+				assert sorted(res) == [1, 2]
+				for channel, (t, v) in res.items():
+					assert t.shape == v.shape == (2500,)
+					assert abs(t[0] + 2.5e-3) < 1e-9
+					assert abs(np.max(v) - 1) < 0.1
+				# cached preambles: one write and block per channel
+				from ..scpi.stats import Stats
+				scpi.stats = Stats()
+				res = scope.acquire()
+				assert {k: v["count"] for k, v in scpi.stats.summary().items()} == {
+				 "SELect:CH1?;:SELect:CH2?": 1,
+				 "DATa:SOUrce;:CURVe?": 2,
+				}
+				scpi.stats = None
+
+				scope.write("DATa:SOUrce MATH")
+				assert scope.data_source() == "MATH"
+				assert scope.preamble().wfid.startswith("Ch3")
+				t, v = scope.acquire(["MATH", 1])["MATH"]
+				assert v.shape == (2500,)
+
+				scope.write("CH2:VOLts 0.5")
+				assert abs(scope.preamble(2).ymult / (0.5 * 10 / 65536) - 1) < 1e-3
+				scope.write("SELect:CH1 OFF")
+				assert list(scope.acquire()) == [2]
+		finally:
+			scpi.__exit__(None, None, None)
+
+
+def test_scope_monitor():
+	from ..oscilloscope.tek import Scope, MeasurementMonitor
+	with Simulator() as sim:
+		scpi = SCPI_TCP(sim.add_tcp(TekScope(points=250)))
+		scpi.__enter__()
+		try:
+			with Scope(scpi) as scope:
+				slots = [("PK2PK", "CH1"), ("FREQ", "CH2"), ("MAXI", "CH2"), ("BOGUS", "CH1")]
+				with MeasurementMonitor(scope, slots, depth=8) as mon:
+					first = mon.poll()
+					for idx in range(9):
+						mon.poll()
+					t, v = mon.data()
+		finally:
+			scpi.__exit__(None, None, None)
+
+	assert mon.count == 10
+	assert v.shape == (8, 4)
+	assert np.all(np.diff(t) >= 0)
+	assert np.all(abs(v[:,0] - 2) < 0.2)
+	assert np.all(v[:,1] == 2000)
+	assert np.all(np.isnan(v[:,3]))
+	assert not np.shares_memory(first, mon.values)
+
+
+def test_async_tcp():
+	from ..psu.psu_agilent_e3634a import AsyncPSU
+	from ..load.load_korad_kel103 import AsyncLoad
+
+	async def main(psu_address, load_address):
+		async with SCPI_TCP_Async(psu_address) as scpi, AsyncPSU(scpi) as psu:
+			await psu.voltage_setpoint_set(5)
+			await psu.current_setpoint_set(1)
+			await psu.enable(True)
+			# concurrent tasks on one transport
+			res = await asyncio.gather(*[ x
+			 for idx in range(10)
+			 for x in (psu.voltage_setpoint_get(), scpi.ask("*IDN?"), psu.snapshot()) ])
+			for idx in range(10):
+				vset, idn, snapshot = res[3*idx:3*idx+3]
+				assert vset == 5
+				assert idn.startswith("HEWLETT-PACKARD,E3634A,")
+				assert snapshot == (5, 1, 5, 0.5)
+
+		async with SCPI_TCP_Async(load_address) as scpi, AsyncLoad(scpi) as load:
+			async with load.in_cc():
+				await load.setpoint_set(2)
+				await load.activate(True)
+				assert await load.setpoint_get() == 2
+				assert await load.activated()
+				res = await asyncio.gather(load.measure_all(), load.measure_u(), load.measure_all())
+				assert res == [(11.8, 2, 23.6), 11.8, (11.8, 2, 23.6)]
+
+	with Simulator() as sim:
+		asyncio.run(main(
+		 sim.add_tcp(E3634A(load=10)),
+		 sim.add_tcp(KEL103(ocv=12, resistance=0.1)),
+		))
+
+
+def test_async_fluke8845():
+	from ..multimeter.multimeter_fluke8845 import AsyncMultimeter
+
+	async def main(address):
+		async with SCPI_TCP_Async(address, eol_rx=b"\r\n") as scpi, AsyncMultimeter(scpi) as meter:
+			res = await asyncio.gather(*[ meter.get_volts() for idx in range(5) ])
+			assert res == [1.5] * 5
+			assert await meter.get_both() == (1.5, 1.5)
+			assert await meter.get_one() == 1.5
+
+	with Simulator() as sim:
+		asyncio.run(main(sim.add_tcp(Fluke8845(value=1.5, noise=0))))
+
+
+def test_async_serial():
+	from ..multimeter.multimeter_keithley_6485 import AsyncMultimeter
+
+	async def main(path):
+		with serial.Serial(path) as ser:
+			async with SCPI_Serial_Async(ser, eol=b"\n", timeout=1) as scpi, AsyncMultimeter(scpi) as meter:
+				res = await asyncio.gather(*[ x
+				 for idx in range(10)
+				 for x in (meter.measure_immediate(), scpi.ask("*IDN?")) ])
+				for idx in range(10):
+					value, idn = res[2*idx:2*idx+2]
+					assert float(value.rstrip("A")) == 1e-9
+					assert idn.startswith("KEITHLEY")
+				assert await scpi.ask_many(["*IDN?", "*OPC?"], pipelined=True) == [idn, "1"]
+
+	with Simulator() as sim:
+		asyncio.run(main(sim.add_pty(Keithley6485(value=1e-9, noise=0))))
+
+
+def test_pty_slow_reader():
+	with Simulator() as sim:
+		path = sim.add_pty(TekScope(points=25000))
+		scpi = SCPI_TCP(sim.add_tcp(E3634A()))
+		scpi.__enter__()
+		try:
+			with serial.Serial(path, timeout=1) as ser:
+				# more than the pty can buffer, not read yet
+				ser.write(b"CURVe?\n")
+				time.sleep(0.1)
+				assert scpi.ask("*IDN?").startswith("HEWLETT-PACKARD")
+				data = ser.read(2 + 5 + 50000 + 1)
+				assert data[:7] == b"#550000" and data[-1:] == b"\n"
+		finally:
+			scpi.__exit__(None, None, None)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 vi:noet
+# Mixin for drivers caching instrument state
+# SPDX-License-Identifier: MIT
+
+"""
+Drivers of instruments whose state only changes on our command (eg.
+setpoints) can avoid querying it back, by keeping a write-through cache:
+
+- setting a value performs the command, then records the value;
+- getting a value is served from the cache, or queried and recorded;
+- the cache is dropped on error, on explicit resync(), and by the
+  driver when the instrument state changes behind its back (eg. recall
+  of a saved configuration).
+
+When disabled (the default), queries always go to the instrument.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class StateCacheMixin:
+	def __init__(self, cache=False):
+		self._state = dict() if cache else None
+
+	def resync(self):
+		"""
+		Forget cached state, so that it's queried again when needed
+		"""
+		if self._state is not None:
+			logger.debug("Forget cached state")
+			self._state.clear()
+
+	def _state_forget(self, *keys):
+		if self._state is not None:
+			for key in keys:
+				self._state.pop(key, None)
+
+	def _state_get(self, key, query):
+		"""
+		:param query: callable obtaining the value from the instrument
+		"""
+		state = self._state
+		if state is None:
+			return query()
+		try:
+			return state[key]
+		except KeyError:
+			pass
+		try:
+			value = query()
+		except:
+			self.resync()
+			raise
+		state[key] = value
+		return value
+
+	def _state_set(self, key, value, command):
+		"""
+		:param command: callable setting the value on the instrument
+		"""
+		try:
+			res = command()
+		except:
+			self.resync()
+			raise
+		if self._state is not None:
+			self._state[key] = value
+		return res